@@ -4,13 +4,14 @@ Handles database connectivity and provides connection utilities.
 """
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import ConnectionFailure, OperationFailure
+from cachetools import TTLCache
+import asyncio
 import logging
 import os
 from typing import Optional, Any
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured once in main.py
 logger = logging.getLogger(__name__)
 
 
@@ -28,21 +29,31 @@ class DatabaseConnection:
         self.mongo_url = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
         self.database_name = os.getenv("DATABASE_NAME", "ai_quiz_generator")
 
+        # Connection pool sizing - minPoolSize keeps warm sockets for the first requests
+        self.max_pool_size = int(os.getenv("MONGO_MAX_POOL", "100"))
+        self.min_pool_size = int(os.getenv("MONGO_MIN_POOL", "10"))
+
     async def connect(self):
         """Establish connection to MongoDB"""
         try:
-            self.client = AsyncIOMotorClient(self.mongo_url)
+            self.client = AsyncIOMotorClient(
+                self.mongo_url,
+                maxPoolSize=self.max_pool_size,
+                minPoolSize=self.min_pool_size,
+                waitQueueTimeoutMS=5000,
+                maxIdleTimeMS=60000,
+                appname="quiz-generator",
+                # Connect lazily on first operation, but fail fast if no server is reachable
+                serverSelectionTimeoutMS=3000,
+            )
             self.database = self.client[self.database_name]
-
-            # Test connection
-            await self.client.admin.command("ping")
-            logger.info(f"✅ Successfully connected to MongoDB at {self.mongo_url}, db='{self.database_name}'")
+            logger.info("✅ MongoDB client configured for %s, db='%s'", self.mongo_url, self.database_name)
 
         except ConnectionFailure as e:
-            logger.error(f"❌ Failed to connect to MongoDB: {str(e)}")
+            logger.error("❌ Failed to connect to MongoDB: %s", e)
             raise
         except Exception as e:
-            logger.error(f"❌ Unexpected error connecting to MongoDB: {str(e)}")
+            logger.error("❌ Unexpected error connecting to MongoDB: %s", e)
             raise
 
     async def close(self):
@@ -73,12 +84,19 @@ async def connect_to_mongo(app):
     await db_connection.connect()
     app.state.db_connection = db_connection
 
+    # Cache hot collection handles so request paths skip the lookup chain
+    app.state.users_coll = db_connection.get_collection(Collections.USERS)
+    app.state.questions_coll = db_connection.get_collection(Collections.QUESTIONS)
+    app.state.quizzes_coll = db_connection.get_collection(Collections.QUIZZES)
+    app.state.sessions_coll = db_connection.get_collection(Collections.QUIZ_SESSIONS)
+
 
 async def close_mongo_connection(app):
     """Close MongoDB connection - called during app shutdown"""
     await db_connection.close()
-    if hasattr(app.state, "db_connection"):
-        del app.state.db_connection
+    for attr in ("db_connection", "users_coll", "questions_coll", "quizzes_coll", "sessions_coll"):
+        if hasattr(app.state, attr):
+            delattr(app.state, attr)
 
 
 def get_database(app=None):
@@ -104,41 +122,109 @@ class Collections:
     ANALYTICS = "analytics"
 
 
+# Quiz sessions older than this are deleted by a TTL index on created_at; 0 keeps them forever
+SESSION_RETENTION_SECONDS = int(os.getenv("SESSION_RETENTION_DAYS", "0")) * 60 * 60 * 24
+SESSION_TTL_INDEX = "created_at_1"
+
+# Indexes created by earlier releases that the compound indexes below make redundant
+# (each is a prefix of, or only ever queried together with, a compound index)
+REDUNDANT_INDEXES = {
+    # login_cov could never cover get_user (it reads every UserInDB field) and held password hashes
+    Collections.USERS: ("login_cov",),
+    Collections.QUESTIONS: ("subject_1_topic_1_difficulty_1", "tags_1"),
+    Collections.QUIZZES: ("created_by_1", "status_1", "created_at_1"),
+    Collections.QUIZ_SESSIONS: ("user_id_1_quiz_id_1",),
+}
+
+# Server error codes for dropping an index or collection that doesn't exist
+_INDEX_NOT_FOUND = 27
+_NAMESPACE_NOT_FOUND = 26
+
+
+async def drop_index_if_exists(collection, name: str) -> bool:
+    """Drop an index by name, treating a missing index or collection as already dropped"""
+    try:
+        await collection.drop_index(name)
+    except OperationFailure as e:
+        if e.code in (_INDEX_NOT_FOUND, _NAMESPACE_NOT_FOUND):
+            return False
+        raise
+    logger.info("Dropped redundant index %s.%s", collection.name, name)
+    return True
+
+
+async def sync_session_ttl_index(collection, retention_seconds: int = SESSION_RETENTION_SECONDS):
+    """
+    Make the created_at TTL index on quiz_sessions match the configured retention
+    Earlier releases created a plain created_at_1 index (and later a 30-day TTL one) with the
+    same key, so an index with other options is dropped before the new one is built.
+    """
+    existing = (await collection.index_information()).get(SESSION_TTL_INDEX)
+    if existing is not None and (not retention_seconds or existing.get("expireAfterSeconds") != retention_seconds):
+        await drop_index_if_exists(collection, SESSION_TTL_INDEX)
+        existing = None
+
+    if retention_seconds and existing is None:
+        await collection.create_index(
+            "created_at", name=SESSION_TTL_INDEX, expireAfterSeconds=retention_seconds, background=True
+        )
+        logger.info("Quiz sessions expire after %d days", retention_seconds // (60 * 60 * 24))
+
+
 async def create_indexes():
     """
     Create database indexes for better performance
+    Called once from the app lifespan in main.py after connecting.
     """
     try:
         database = get_database()
 
-        # Users
         users_collection = database[Collections.USERS]
-        await users_collection.create_index("username", unique=True)
-        await users_collection.create_index("email", unique=True)
-
-        # Questions
         questions_collection = database[Collections.QUESTIONS]
-        await questions_collection.create_index(
-            [("subject", 1), ("topic", 1), ("difficulty", 1)]
-        )
-        await questions_collection.create_index("tags")
-        await questions_collection.create_index("created_by")
-
-        # Quizzes
         quizzes_collection = database[Collections.QUIZZES]
-        await quizzes_collection.create_index("created_by")
-        await quizzes_collection.create_index("status")
-        await quizzes_collection.create_index("created_at")
-
-        # Quiz sessions
         sessions_collection = database[Collections.QUIZ_SESSIONS]
-        await sessions_collection.create_index([("user_id", 1), ("quiz_id", 1)])
-        await sessions_collection.create_index("created_at")
+
+        # Index builds are independent, so issue them concurrently over the pool
+        await asyncio.gather(
+            # Users - unique username backs every get_user lookup (login, /me, /verify-token)
+            users_collection.create_index("username", unique=True, background=True),
+            users_collection.create_index("email", unique=True, background=True),
+            # Questions
+            questions_collection.create_index(
+                [("subject", 1), ("topic", 1), ("difficulty", 1), ("tags", 1)],
+                background=True,
+            ),
+            questions_collection.create_index("created_by", background=True),
+            # Quizzes
+            quizzes_collection.create_index(
+                [("created_by", 1), ("status", 1), ("created_at", -1)],
+                name="user_status_recent",
+                background=True,
+            ),
+            # Quiz sessions
+            sessions_collection.create_index(
+                [("user_id", 1), ("created_at", -1), ("quiz_id", 1)],
+                name="user_recent",
+                background=True,
+            ),
+            # Optionally expire old sessions so the working set stays bounded
+            sync_session_ttl_index(sessions_collection),
+        )
+
+        # Drop superseded indexes only once their replacements exist
+        await asyncio.gather(*(
+            drop_index_if_exists(database[collection_name], name)
+            for collection_name, names in REDUNDANT_INDEXES.items()
+            for name in names
+        ))
 
         logger.info("✅ Database indexes created successfully")
 
     except Exception as e:
-        logger.error(f"❌ Error creating database indexes: {str(e)}")
+        logger.error("❌ Error creating database indexes: %s", e)
+
+
+_collection_stats_cache: TTLCache = TTLCache(maxsize=1, ttl=5)
 
 
 async def health_check() -> dict[str, Any]:
@@ -149,10 +235,15 @@ async def health_check() -> dict[str, Any]:
         database = get_database()
         await database.command("ping")
 
-        stats = {}
-        for collection_name in [Collections.USERS, Collections.QUESTIONS, Collections.QUIZZES]:
-            count = await database[collection_name].count_documents({})
-            stats[collection_name] = count
+        stats = _collection_stats_cache.get("stats")
+        if stats is None:
+            # Metadata-based counts are O(1); cache briefly to absorb probe bursts
+            collection_names = [Collections.USERS, Collections.QUESTIONS, Collections.QUIZZES]
+            counts = await asyncio.gather(
+                *(database[name].estimated_document_count() for name in collection_names)
+            )
+            stats = dict(zip(collection_names, counts))
+            _collection_stats_cache["stats"] = stats
 
         return {
             "status": "healthy",
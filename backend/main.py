@@ -5,30 +5,57 @@ Entry point for the quiz generation system.
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from bson import ObjectId
+import orjson
+import logging
+import os
 import uvicorn
 from contextlib import asynccontextmanager
 
-from database.connection import connect_to_mongo, close_mongo_connection
+from database.connection import connect_to_mongo, close_mongo_connection, create_indexes
 from routers import auth, quiz, analytics
 
+# Configure logging once for the whole app (modules only create loggers)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+
 # Application lifecycle manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: connect to MongoDB
     await connect_to_mongo(app)
     print("🚀 Connected to MongoDB")
+    await create_indexes()
     yield
-    # Shutdown: close MongoDB connection
+    # Shutdown: close pooled AI provider clients and the MongoDB connection
+    await quiz.close_ai_services()
     await close_mongo_connection(app)
     print("🔌 Disconnected from MongoDB")
 
+def _orjson_default(obj):
+    """Fallback encoder for types orjson doesn't handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+
+class ObjectIdORJSONResponse(ORJSONResponse):
+    """orjson-backed response that also serializes MongoDB ObjectIds"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_orjson_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AI-Enhanced Quiz Generator",
     description="A scalable quiz generation system using AI APIs and tree-based question organization",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ObjectIdORJSONResponse
 )
 
 # CORS middleware
@@ -63,7 +90,7 @@ async def health_check():
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    return JSONResponse(
+    return ObjectIdORJSONResponse(
         status_code=500,
         content={"message": "Internal server error", "detail": str(exc)}
     )
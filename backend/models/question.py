@@ -3,11 +3,11 @@ Question Model - Defines question data structure for the quiz system
 Supports multiple question types and difficulty levels with AI-generated content.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
-from bson import ObjectId
+from ._types import PyObjectId
 
 class DifficultyLevel(str, Enum):
     """Question difficulty levels for adaptive learning"""
@@ -23,23 +23,13 @@ class QuestionType(str, Enum):
     SHORT_ANSWER = "short_answer"
     FILL_BLANK = "fill_blank"
 
-class PyObjectId(ObjectId):
-    """Custom ObjectId field for Pydantic models"""
-    @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
-    
-    @classmethod
-    def validate(cls, v):
-        if not ObjectId.is_valid(v):
-            raise ValueError("Invalid ObjectId")
-        return ObjectId(v)
-
 class QuestionOption(BaseModel):
     """Individual question option for multiple choice questions"""
     text: str
     is_correct: bool = False
     explanation: Optional[str] = None
+    
+    model_config = ConfigDict(frozen=True)
 
 class QuestionBase(BaseModel):
     """Base question model"""
@@ -67,10 +57,8 @@ class QuestionResponse(QuestionBase):
     success_rate: float = 0.0  # Percentage of correct answers
     ai_generated: bool = False
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    # Frozen: queues, trees and the session store share instances and cache per-question data
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
 
 class QuestionUpdate(BaseModel):
     """Question update model"""
@@ -81,6 +69,36 @@ class QuestionUpdate(BaseModel):
     explanation: Optional[str] = None
     tags: Optional[List[str]] = None
 
+class QuestionOptionSchema(BaseModel):
+    """Option shape requested from AI providers"""
+    text: str
+    is_correct: bool
+
+class QuestionSchema(BaseModel):
+    """Question shape AI providers must return (used as the function-calling schema)"""
+    question: str
+    options: List[QuestionOptionSchema] = Field(default_factory=list)
+    correct_answer: Optional[str] = None
+    explanation: str = ""
+    difficulty: DifficultyLevel = DifficultyLevel.INTERMEDIATE
+    subject: Optional[str] = None
+    topic: str = "General"
+    
+    @field_validator("difficulty", mode="before")
+    @classmethod
+    def normalize_difficulty(cls, value: Any) -> DifficultyLevel:
+        """Accept any casing from the provider and fall back to intermediate for unknown levels"""
+        if isinstance(value, DifficultyLevel):
+            return value
+        try:
+            return DifficultyLevel(str(value).strip().lower())
+        except ValueError:
+            return DifficultyLevel.INTERMEDIATE
+
+class QuestionBatchSchema(BaseModel):
+    """Several questions returned by one AI call, item i for text chunk i"""
+    questions: List[QuestionSchema]
+
 class QuestionFilter(BaseModel):
     """Question filtering model for search and organization"""
     subject: Optional[str] = None
@@ -3,12 +3,12 @@ Quiz Model - Defines quiz session structure and management
 Handles quiz creation, sequencing, and performance tracking.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
-from bson import ObjectId
 from .question import QuestionResponse, DifficultyLevel
+from ._types import PyObjectId
 
 class QuizStatus(str, Enum):
     """Quiz session status"""
@@ -18,18 +18,6 @@ class QuizStatus(str, Enum):
     PAUSED = "paused"
     ABANDONED = "abandoned"
 
-class PyObjectId(ObjectId):
-    """Custom ObjectId field for Pydantic models"""
-    @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
-    
-    @classmethod
-    def validate(cls, v):
-        if not ObjectId.is_valid(v):
-            raise ValueError("Invalid ObjectId")
-        return ObjectId(v)
-
 class QuizAnswer(BaseModel):
     """Individual quiz answer"""
     question_id: str
@@ -73,10 +61,7 @@ class QuizResponse(QuizBase):
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True)
 
 class QuizSession(BaseModel):
     """Active quiz session model"""
@@ -3,30 +3,10 @@ User Model - Defines user data structure and validation
 Handles user authentication and profile management for the quiz system.
 """
 
-from pydantic import BaseModel, EmailStr, Field, GetCoreSchemaHandler
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from typing import Optional, List, Dict
 from datetime import datetime
-from bson import ObjectId
-from pydantic_core import core_schema
-
-
-class PyObjectId(ObjectId):
-    """Custom ObjectId field for Pydantic models"""
-    @classmethod
-    def __get_pydantic_core_schema__(cls, source, handler: GetCoreSchemaHandler):
-        return core_schema.no_info_plain_validator_function(cls.validate)
-
-    @classmethod
-    def validate(cls, v):
-        if not ObjectId.is_valid(v):
-            raise ValueError("Invalid ObjectId")
-        return ObjectId(v)
-
-    @classmethod
-    def __get_pydantic_json_schema__(cls, core_schema, handler):
-        schema = handler(core_schema)
-        schema.update(type="string")
-        return schema
+from ._types import PyObjectId
 
 
 class UserBase(BaseModel):
@@ -49,10 +29,7 @@ class UserResponse(UserBase):
     quiz_history: List[str] = Field(default_factory=list)
     performance_stats: Dict = Field(default_factory=dict)
 
-    class Config:
-        populate_by_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class UserInDB(UserResponse):
@@ -5,66 +5,172 @@ Handles user registration, login, and JWT token management.
 
 from fastapi import APIRouter, HTTPException, Depends, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from passlib.context import CryptContext
+import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 from datetime import datetime, timedelta
-import jwt
-from typing import Optional, Dict, Any
+from cachetools import TLRUCache, TTLCache
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import DuplicateKeyError
+from jose import jwt, JWTError
+from typing import Optional, Dict, Any, Tuple
+import asyncio
+import base64
+import calendar
+import hashlib
+import hmac
+import json
 import logging
+import os
+import time
 
 from backend.models.user import UserCreate, UserResponse, UserLogin, UserInDB
-from backend.database.connection import get_database, Collections, DatabaseOperations, create_indexes
 
 # Logging setup
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Password & security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password & security - new hashes use argon2id; legacy bcrypt hashes are
+# still accepted and upgraded to argon2id on the next successful login
+password_hasher = PasswordHasher(
+    time_cost=int(os.getenv("ARGON2_TIME_COST", "2")),
+    memory_cost=int(os.getenv("ARGON2_MEMORY_COST", "19456")),
+)
 security = HTTPBearer()
 
+# Verified against when the user is missing so login timing doesn't reveal usernames
+DUMMY_HASH = password_hasher.hash("x")
+
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Decode settings built once rather than per request
+_ALGS = (ALGORITHM,)
+_DECODE_OPTS = {"require_exp": True, "require_sub": True}
+
+# Short-lived caches for the auth hot path: decoded payloads keyed by a token
+# digest (raw tokens are never stored) and authenticated users keyed by username
+PAYLOAD_CACHE_TTL_SECONDS = 30
+
+
+def _payload_expiry(_key: bytes, payload: Dict[str, Any], now: float) -> float:
+    """Keep a decoded payload for the cache TTL, but never past the token's own exp"""
+    return min(now + PAYLOAD_CACHE_TTL_SECONDS, payload["exp"])
+
+
+# Wall-clock timer so entries expire on the same clock as the token's exp claim
+_payload_cache: TLRUCache = TLRUCache(maxsize=10_000, ttu=_payload_expiry, timer=time.time)
+# Entries are dropped on every user write in this worker; the TTL bounds staleness from other workers
+_user_cache: TTLCache = TTLCache(maxsize=5_000, ttl=60)
+
+
+def invalidate_user_cache(username: str):
+    """Forget the cached user; call after any write to that user's document"""
+    _user_cache.pop(username, None)
+
+# Only fetch the fields UserInDB needs; the lookup is served by the unique username index
+USER_PROJECTION = {"_id": 1, **{field: 1 for field in UserInDB.model_fields if field != "id"}}
+
 
 # ---------------------------
 # HELPER FUNCTIONS
 # ---------------------------
 async def get_user(username: str, request: Request) -> Optional[UserInDB]:
-    db = get_database(request.app)
-    if db is None:
+    users_coll = getattr(request.app.state, "users_coll", None)
+    if users_coll is None:
         logger.error("get_user: Database not initialized")
         return None
-    user_data = await db[Collections.USERS].find_one({"username": username})
+    user_data = await users_coll.find_one({"username": username}, USER_PROJECTION)
     if not user_data:
         return None
-    user_data["_id"] = str(user_data["_id"])
     return UserInDB(**user_data)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+def _checkpw(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning (valid, new_hash) where new_hash is set if it should be rehashed"""
+    if hashed_password.startswith("$argon2"):
+        try:
+            password_hasher.verify(hashed_password, plain_password)
+        except (VerificationError, InvalidHashError):
+            return False, None
+        if password_hasher.check_needs_rehash(hashed_password):
+            return True, password_hasher.hash(plain_password)
+        return True, None
+
+    # Legacy bcrypt hash ($2a$/$2b$/$2y$, including ones written by passlib)
+    try:
+        valid = bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    except ValueError:
+        # Malformed or unknown hash format
+        return False, None
+    if valid:
+        return True, password_hasher.hash(plain_password)
+    return False, None
+
+
+def _hashpw(password: str) -> str:
+    return password_hasher.hash(password)
+
+
+# Password hashing is CPU-bound, so run it off the event loop on a pool sized
+# to the core count (argon2/bcrypt release the GIL, so hashes run in parallel)
+_password_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="password-hash")
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, _checkpw, plain_password, hashed_password)
+
 
+async def get_password_hash(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, _hashpw, password)
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+# Header and key never change, so encode them once (HS256 => HMAC-SHA256)
+_JWT_HEADER = _b64url(json.dumps({"alg": ALGORITHM, "typ": "JWT"}, separators=(",", ":"), sort_keys=True).encode())
+_SECRET_KEY_BYTES = SECRET_KEY.encode()
 
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.update({"exp": calendar.timegm(expire.utctimetuple())})
+    payload = _b64url(json.dumps(to_encode, separators=(",", ":")).encode())
+    signing_input = f"{_JWT_HEADER}.{payload}"
+    signature = hmac.new(_SECRET_KEY_BYTES, signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64url(signature)}"
+
+
+def _decode(token: str) -> Dict[str, Any]:
+    """Decode and verify a token; repeated bearer tokens hit the cache"""
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _payload_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=_ALGS, options=_DECODE_OPTS)
+        _payload_cache[key] = payload
+    return payload
 
 
 async def authenticate_user(username: str, password: str, request: Request) -> Optional[UserInDB]:
     user = await get_user(username, request)
     if not user:
+        await verify_password(password, DUMMY_HASH)
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_password(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        await request.app.state.users_coll.update_one(
+            {"_id": user.id}, {"$set": {"hashed_password": new_hash}}
+        )
+        invalidate_user_cache(user.username)
     return user
 
 
@@ -76,18 +182,28 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="Request object required")
     token = credentials.credentials
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if not username:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-    except jwt.PyJWTError:
+        payload = _decode(token)
+    except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
-    user = await get_user(username, request)
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    user_dict = user.dict()
-    user_dict.pop("hashed_password", None)
-    return UserResponse(**user_dict)
+    # Cached payloads skip jose's own expiry check; the cache drops them at exp, but keep the explicit check
+    if payload.get("exp", 0) <= time.time():
+        raise HTTPException(status_code=401, detail="Token expired")
+    username: str = payload.get("sub")
+    if not username:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    user_response = _user_cache.get(username)
+    if user_response is None:
+        user = await get_user(username, request)
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        # UserInDB was just validated, so skip re-validating the same data
+        user_response = UserResponse.model_construct(**user.model_dump(exclude={"hashed_password"}))
+        _user_cache[username] = user_response
+    # Checked on cache hits too, so a deactivated user is never served
+    if not user_response.is_active:
+        invalidate_user_cache(username)
+        raise HTTPException(status_code=401, detail="Inactive user")
+    return user_response
 
 
 # ---------------------------
@@ -95,10 +211,7 @@ async def get_current_user(
 # ---------------------------
 @router.post("/register", response_model=UserResponse)
 async def register_user(user: UserCreate, request: Request):
-    existing_user = await get_user(user.username, request)
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_data = {
         "username": user.username,
         "email": user.email,
@@ -109,8 +222,16 @@ async def register_user(user: UserCreate, request: Request):
         "quiz_history": [],
         "performance_stats": {}
     }
-    inserted_id = await DatabaseOperations.insert_one(Collections.USERS, user_data)
-    user_data["_id"] = str(inserted_id)
+    # The unique indexes enforce uniqueness, so insert directly instead of pre-checking
+    try:
+        # insert_one sets user_data["_id"] to the new ObjectId, which PyObjectId accepts as-is
+        await request.app.state.users_coll.insert_one(user_data, bypass_document_validation=True)
+    except DuplicateKeyError as e:
+        key_pattern = (e.details or {}).get("keyPattern", {})
+        field = "Email" if "email" in key_pattern else "Username"
+        raise HTTPException(status_code=400, detail=f"{field} already registered")
+    # A cached entry could only belong to an earlier user of this username
+    invalidate_user_cache(user.username)
     return UserResponse(**user_data)
 
 
@@ -123,7 +244,10 @@ async def login_user(user_credentials: UserLogin, request: Request):
         data={"sub": user.username},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    user_response = UserResponse(**user.dict())
+    user_response = UserResponse.model_construct(**user.model_dump(exclude={"hashed_password"}))
+    # Warm the user cache so the follow-up authenticated request skips MongoDB
+    if user.is_active:
+        _user_cache[user.username] = user_response
     return {"access_token": access_token, "token_type": "bearer", "user": user_response}
 
 
@@ -140,11 +264,6 @@ async def verify_token(current_user: UserResponse = Depends(get_current_user)):
 # ---------------------------
 # TEST / DEBUG ROUTES
 # ---------------------------
-@router.on_event("startup")
-async def setup_database_and_test_user():
-    await create_indexes()
-
-
 @router.post("/create-test-user")
 async def manual_create_test_user(request: Request):
     from backend.models.user import UserCreate
@@ -154,19 +273,21 @@ async def manual_create_test_user(request: Request):
         password="testpassword123",
         full_name="Test User"
     )
-    existing = await get_user("testuser", request)
-    if not existing:
-        hashed_password = get_password_hash(test_user.password)
-        user_data = {
-            "username": test_user.username,
-            "email": test_user.email,
-            "full_name": test_user.full_name,
-            "hashed_password": hashed_password,
-            "created_at": datetime.utcnow(),
-            "is_active": True,
-            "quiz_history": [],
-            "performance_stats": {}
-        }
-        inserted_id = await DatabaseOperations.insert_one(Collections.USERS, user_data)
-        return {"message": "Test user created", "user_id": str(inserted_id)}
-    return {"message": "Test user already exists"}
+    hashed_password = await get_password_hash(test_user.password)
+    user_data = {
+        "username": test_user.username,
+        "email": test_user.email,
+        "full_name": test_user.full_name,
+        "hashed_password": hashed_password,
+        "created_at": datetime.utcnow(),
+        "is_active": True,
+        "quiz_history": [],
+        "performance_stats": {}
+    }
+    # Same single round-trip as /register - the unique indexes reject repeats
+    try:
+        result = await request.app.state.users_coll.insert_one(user_data)
+    except DuplicateKeyError:
+        return {"message": "Test user already exists"}
+    invalidate_user_cache(test_user.username)
+    return {"message": "Test user created", "user_id": str(result.inserted_id)}
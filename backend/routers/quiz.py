@@ -4,28 +4,123 @@ Handles quiz creation, question serving, answer submission, and progress trackin
 """
 
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional, Dict, Any
+from fastapi.responses import StreamingResponse
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
+import hashlib
 import logging
+import os
+import numpy as np
+import orjson
 from datetime import datetime
 
 from backend.models.quiz import QuizCreate, QuizResponse, QuizSession, QuizStats, QuizConfiguration
-from backend.models.question import QuestionResponse, DifficultyLevel, QuestionFilter
+from backend.models._types import PyObjectId
+from backend.models.question import QuestionResponse, QuestionCreate, DifficultyLevel, QuestionFilter
 from backend.services.ai_service import AIQuestionGenerator
 from backend.utils.tree_structure import QuestionTree
 from backend.utils.queue_manager import QuestionQueue
+from backend.utils.session_store import SessionStore
 from backend.database.connection import get_database
 from backend.routers.auth import get_current_user
 from backend.models.user import UserResponse
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Global instances (in production, these should be managed differently)
 question_tree = QuestionTree()
-active_sessions: Dict[str, QuestionQueue] = {}
+# Active sessions and generated questions, shared across workers via Redis when configured
+session_store = SessionStore(os.getenv("REDIS_URL"))
+
+# Sessions with at least this many answers aggregate stats with NumPy
+VECTORIZED_STATS_MIN_ANSWERS = 100
+_DIFFICULTY_LEVELS = list(DifficultyLevel)
+_DIFFICULTY_CODES = {level: code for code, level in enumerate(_DIFFICULTY_LEVELS)}
+
+def _aggregate_answers_vectorized(answered_questions: List[Dict[str, Any]]):
+    """
+    Aggregate answer statistics over column arrays for long sessions
+    Returns (correct_answers, total_time, difficulty_breakdown, topic_performance)
+    """
+    count = len(answered_questions)
+    is_correct = np.fromiter((ans['is_correct'] for ans in answered_questions), dtype=np.bool_, count=count)
+    times = np.fromiter((ans['time_taken'] for ans in answered_questions), dtype=np.float64, count=count)
+    difficulties = np.fromiter(
+        (_DIFFICULTY_CODES[ans['difficulty']] for ans in answered_questions), dtype=np.int8, count=count
+    )
+    topics, topic_codes = np.unique([ans['question'].topic for ans in answered_questions], return_inverse=True)
+
+    num_levels = len(_DIFFICULTY_LEVELS)
+    difficulty_totals = np.bincount(difficulties, minlength=num_levels)
+    difficulty_correct = np.bincount(difficulties, weights=is_correct, minlength=num_levels)
+    topic_totals = np.bincount(topic_codes, minlength=len(topics))
+    topic_correct = np.bincount(topic_codes, weights=is_correct, minlength=len(topics))
+
+    difficulty_breakdown = {
+        level.value: {'correct': int(difficulty_correct[code]), 'total': int(difficulty_totals[code])}
+        for code, level in enumerate(_DIFFICULTY_LEVELS) if difficulty_totals[code]
+    }
+    topic_performance = {
+        str(topic): [int(topic_correct[code]), int(topic_totals[code])] for code, topic in enumerate(topics)
+    }
+    return int(is_correct.sum()), float(times.sum()), difficulty_breakdown, topic_performance
+
+# One AIQuestionGenerator per (api key, provider) instead of one per request, least recently
+# used first. Keyed by a digest so raw API keys are not held as cache keys.
+AI_SERVICE_CACHE_SIZE = 32
+_ai_services: "OrderedDict[Tuple[Optional[str], str], AIQuestionGenerator]" = OrderedDict()
+# Requests currently using each generator; an evicted one is closed when its last user finishes
+_ai_service_leases: Counter = Counter()
+
+@asynccontextmanager
+async def _ai_service(api_key: Optional[str], provider: str) -> AsyncIterator[AIQuestionGenerator]:
+    """Lease the cached AIQuestionGenerator for a key, closing generators evicted from the cache"""
+    key = (hashlib.sha256(api_key.encode()).hexdigest() if api_key else None, provider)
+    service = _ai_services.pop(key, None) or AIQuestionGenerator(api_key=api_key, provider=provider)
+    _ai_services[key] = service
+    _ai_service_leases[service] += 1
+
+    evicted = []
+    while len(_ai_services) > AI_SERVICE_CACHE_SIZE:
+        evicted.append(_ai_services.popitem(last=False)[1])
+    for old_service in evicted:
+        if not _ai_service_leases[old_service]:
+            await old_service.aclose()
+
+    try:
+        yield service
+    finally:
+        _ai_service_leases[service] -= 1
+        if not _ai_service_leases[service]:
+            del _ai_service_leases[service]
+            if _ai_services.get(key) is not service:
+                await service.aclose()
+
+async def close_ai_services():
+    """Close every cached AI generator's HTTP client (app shutdown)"""
+    services = list(_ai_services.values())
+    _ai_services.clear()
+    for service in services:
+        await service.aclose()
+
+def _to_question_response(ai_q: QuestionCreate, user_id: str) -> QuestionResponse:
+    """Convert an AI-generated question into a QuestionResponse"""
+    return QuestionResponse(
+        text=ai_q.text,
+        question_type=ai_q.question_type,
+        subject=ai_q.subject,
+        topic=ai_q.topic,
+        difficulty=ai_q.difficulty,
+        options=ai_q.options,
+        correct_answer=ai_q.correct_answer,
+        explanation=ai_q.explanation,
+        created_by=user_id,
+        ai_generated=ai_q.ai_generated
+    )
 
 @router.post("/generate-quiz", response_model=QuizResponse)
 async def generate_quiz(
@@ -38,82 +133,55 @@ async def generate_quiz(
     Main workflow endpoint that demonstrates the complete system
     """
     try:
-        logger.info(f"Generating quiz for user {current_user.username}")
+        logger.info("Generating quiz for user %s", current_user.username)
         
-        # Initialize AI service
-        ai_service = AIQuestionGenerator(api_key=ai_api_key, provider="openai")
-        
-        # Extract configuration
-        config = quiz_data.configuration
-        
-        # Generate questions from source text if provided
-        questions = []
-        if quiz_data.source_text:
-            logger.info("Generating questions from source text using AI")
-            ai_questions = await ai_service.generate_questions_from_text(
-                text=quiz_data.source_text,
-                question_count=config.question_count,
-                subject=config.subject,
-                difficulty_preference=config.difficulty_levels[0] if config.difficulty_levels else None
-            )
-            
-            # Convert AI questions to QuestionResponse objects
-            for ai_q in ai_questions:
-                question_response = QuestionResponse(
-                    text=ai_q.text,
-                    question_type=ai_q.question_type,
-                    subject=ai_q.subject,
-                    topic=ai_q.topic,
-                    difficulty=ai_q.difficulty,
-                    options=ai_q.options,
-                    correct_answer=ai_q.correct_answer,
-                    explanation=ai_q.explanation,
-                    created_by=str(current_user.id),
-                    ai_generated=ai_q.ai_generated
-                )
-                questions.append(question_response)
-                
-                # Add question to tree structure
-                question_tree.add_question(question_response)
-        else:
-            # Retrieve questions from existing tree based on criteria
-            logger.info("Retrieving questions from question tree")
-            filter_criteria = QuestionFilter(
-                subject=config.subject if config.subject != "General" else None,
-                difficulty=config.difficulty_levels[0] if config.difficulty_levels else None
-            )
-            
-            questions = question_tree.get_questions_by_criteria(
-                subject=filter_criteria.subject,
-                difficulty=filter_criteria.difficulty,
-                limit=config.question_count
-            )
+        # Reuse the AI service configured for this key
+        async with _ai_service(ai_api_key, "openai") as ai_service:
+            # Extract configuration
+            config = quiz_data.configuration
             
-            # If no questions found, generate mock questions
-            if not questions:
-                logger.info("No existing questions found, generating mock questions")
-                mock_text = f"This is sample content for {config.subject} quiz generation."
+            # Generate questions from source text if provided
+            questions = []
+            if quiz_data.source_text:
+                logger.info("Generating questions from source text using AI")
                 ai_questions = await ai_service.generate_questions_from_text(
-                    text=mock_text,
+                    text=quiz_data.source_text,
                     question_count=config.question_count,
-                    subject=config.subject
+                    subject=config.subject,
+                    difficulty_preference=config.difficulty_levels[0] if config.difficulty_levels else None
                 )
                 
-                for ai_q in ai_questions:
-                    question_response = QuestionResponse(
-                        text=ai_q.text,
-                        question_type=ai_q.question_type,
-                        subject=ai_q.subject,
-                        topic=ai_q.topic,
-                        difficulty=ai_q.difficulty,
-                        options=ai_q.options,
-                        correct_answer=ai_q.correct_answer,
-                        explanation=ai_q.explanation,
-                        created_by=str(current_user.id),
-                        ai_generated=ai_q.ai_generated
+                # Convert AI questions to QuestionResponse objects and add them to the tree in one pass
+                questions = [_to_question_response(ai_q, str(current_user.id)) for ai_q in ai_questions]
+                question_tree.add_questions_bulk(questions)
+                await session_store.add_questions(questions)
+            else:
+                # Retrieve questions from existing tree based on criteria
+                logger.info("Retrieving questions from question tree")
+                filter_criteria = QuestionFilter(
+                    subject=config.subject if config.subject != "General" else None,
+                    difficulty=config.difficulty_levels[0] if config.difficulty_levels else None
+                )
+                
+                questions = question_tree.get_questions_by_criteria(
+                    subject=filter_criteria.subject,
+                    difficulty=filter_criteria.difficulty,
+                    limit=config.question_count
+                )
+                
+                # If no questions found, generate mock questions
+                if not questions:
+                    logger.info("No existing questions found, generating mock questions")
+                    mock_text = f"This is sample content for {config.subject} quiz generation."
+                    ai_questions = await ai_service.generate_questions_from_text(
+                        text=mock_text,
+                        question_count=config.question_count,
+                        subject=config.subject
                     )
-                    questions.append(question_response)
-                    question_tree.add_question(question_response)
+                    
+                    questions = [_to_question_response(ai_q, str(current_user.id)) for ai_q in ai_questions]
+                    question_tree.add_questions_bulk(questions)
+                    await session_store.add_questions(questions)
         
         # Create quiz response object
         quiz = QuizResponse(
@@ -128,16 +196,61 @@ async def generate_quiz(
         session_id = str(quiz.id)
         question_queue = QuestionQueue(adaptive_mode=config.adaptive_difficulty)
         question_queue.add_questions(questions, randomize=config.randomize_questions)
-        active_sessions[session_id] = question_queue
+        await session_store.save_session(session_id, question_queue)
         
-        logger.info(f"Quiz generated successfully with {len(questions)} questions")
+        logger.info("Quiz generated successfully with %d questions", len(questions))
         
         return quiz
         
     except Exception as e:
-        logger.error(f"Error generating quiz: {str(e)}")
+        logger.error("Error generating quiz: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to generate quiz: {str(e)}")
 
+@router.post("/generate-quiz/stream")
+async def generate_quiz_stream(
+    quiz_data: QuizCreate,
+    current_user: UserResponse = Depends(get_current_user),
+    ai_api_key: Optional[str] = Query(None, description="OpenAI API Key for question generation")
+):
+    """
+    Generate a quiz from source text, streaming questions as NDJSON
+    The first line carries the quiz_id; each following line is one question,
+    sent as soon as the AI provider returns it.
+    """
+    if not quiz_data.source_text:
+        raise HTTPException(status_code=400, detail="source_text is required for streaming generation")
+
+    logger.info("Streaming quiz generation for user %s", current_user.username)
+    config = quiz_data.configuration
+    user_id = str(current_user.id)
+    session_id = str(PyObjectId())
+
+    async def question_stream():
+        yield orjson.dumps({"quiz_id": session_id}) + b"\n"
+
+        questions = []
+        # Held for the whole stream so the generator isn't closed mid-response
+        async with _ai_service(ai_api_key, "openai") as ai_service:
+            async for ai_q in ai_service.iter_questions_from_text(
+                text=quiz_data.source_text,
+                question_count=config.question_count,
+                subject=config.subject,
+                difficulty_preference=config.difficulty_levels[0] if config.difficulty_levels else None
+            ):
+                question = _to_question_response(ai_q, user_id)
+                question_tree.add_question(question)
+                await session_store.add_questions([question])
+                questions.append(question)
+                yield question.model_dump_json(by_alias=True).encode() + b"\n"
+
+        # The session is usable once every question has been sent
+        question_queue = QuestionQueue(adaptive_mode=config.adaptive_difficulty)
+        question_queue.add_questions(questions, randomize=config.randomize_questions)
+        await session_store.save_session(session_id, question_queue)
+        logger.info("Streamed quiz %s with %d questions", session_id, len(questions))
+
+    return StreamingResponse(question_stream(), media_type="application/x-ndjson")
+
 @router.get("/quiz/{quiz_id}/next-question")
 async def get_next_question(
     quiz_id: str,
@@ -148,16 +261,16 @@ async def get_next_question(
     Demonstrates queue management and adaptive difficulty
     """
     try:
-        # Get question queue for this session
-        question_queue = active_sessions.get(quiz_id)
+        # Pop the next question and persist the queue in one atomic session update
+        question_queue, next_question = await session_store.update_session(
+            quiz_id, lambda queue: queue.get_next_question()
+        )
         if not question_queue:
-            logger.error(f"Quiz session not found for quiz_id: {quiz_id}. Active sessions: {list(active_sessions.keys())}")
+            logger.error("Quiz session not found for quiz_id: %s", quiz_id)
             raise HTTPException(status_code=404, detail=f"Quiz session not found for quiz_id: {quiz_id}")
 
-        # Get next question from queue
-        next_question = question_queue.get_next_question()
         if not next_question:
-            logger.info(f"Quiz completed for quiz_id: {quiz_id}")
+            logger.info("Quiz completed for quiz_id: %s", quiz_id)
             return {
                 "question": None,
                 "message": "Quiz completed",
@@ -183,7 +296,7 @@ async def get_next_question(
         }
         
     except Exception as e:
-        logger.error(f"Error getting next question for quiz_id {quiz_id}: {e}")
+        logger.error("Error getting next question for quiz_id %s: %s", quiz_id, e)
         raise HTTPException(status_code=500, detail=f"Internal error for quiz_id {quiz_id}: {e}")
 
 @router.post("/quiz/{quiz_id}/submit-answer")
@@ -197,37 +310,38 @@ async def submit_answer(
     Updates adaptive difficulty based on performance
     """
     try:
-        # Get question queue for this session
-        question_queue = active_sessions.get(quiz_id)
-        if not question_queue:
-            raise HTTPException(status_code=404, detail="Quiz session not found")
-        
         question_id = answer_data.get("question_id")
         user_answer = answer_data.get("answer")
         time_taken = answer_data.get("time_taken", 0)
         
-        # Find the question in the tree to check correct answer
-        all_questions = question_tree.get_questions_by_criteria()
-        question = next((q for q in all_questions if str(q.id) == question_id), None)
+        # Look up the question to check correct answer
+        question = await session_store.get_question(question_id)
         
         if not question:
             raise HTTPException(status_code=404, detail="Question not found")
         
         # Evaluate answer
         is_correct = False
+        correct_option_text = None
         if question.question_type.value == "multiple_choice":
-            # Find correct option
-            correct_option = next((opt for opt in question.options if opt.is_correct), None)
-            if correct_option:
-                is_correct = user_answer == correct_option.text
+            # Correct option text is precomputed when the question is indexed
+            correct_option_text = session_store.get_correct_option_text(question)
+            if correct_option_text is not None:
+                is_correct = user_answer == correct_option_text
         elif question.question_type.value == "true_false":
             is_correct = user_answer.lower() == question.correct_answer.lower()
         else:
             # For other types, simple string comparison
             is_correct = user_answer.lower().strip() == question.correct_answer.lower().strip()
         
-        # Record answer in queue for adaptive learning
-        question_queue.record_answer(question, is_correct, time_taken)
+        # Record answer in queue for adaptive learning; atomic so concurrent submissions aren't lost
+        question_queue, _ = await session_store.update_session(
+            quiz_id, lambda queue: queue.record_answer(question, is_correct, time_taken)
+        )
+        if not question_queue:
+            raise HTTPException(status_code=404, detail="Quiz session not found")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Answer recorded for quiz_id %s, question %s: correct=%s", quiz_id, question_id, is_correct)
         
         # Prepare feedback response
         feedback = {
@@ -239,15 +353,13 @@ async def submit_answer(
         }
         
         # Add correct option for multiple choice
-        if question.question_type.value == "multiple_choice":
-            correct_option = next((opt for opt in question.options if opt.is_correct), None)
-            if correct_option:
-                feedback["correct_option"] = correct_option.text
+        if correct_option_text is not None:
+            feedback["correct_option"] = correct_option_text
         
         return feedback
         
     except Exception as e:
-        logger.error(f"Error submitting answer: {str(e)}")
+        logger.error("Error submitting answer: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/quiz/{quiz_id}/stats")
@@ -259,7 +371,7 @@ async def get_quiz_stats(
     Get comprehensive quiz statistics and performance analytics
     """
     try:
-        question_queue = active_sessions.get(quiz_id)
+        question_queue = await session_store.get_session(quiz_id)
         if not question_queue:
             raise HTTPException(status_code=404, detail="Quiz session not found")
         
@@ -269,39 +381,35 @@ async def get_quiz_stats(
             return {"message": "No answers submitted yet"}
         
         total_questions = len(answered_questions)
-        correct_answers = sum(1 for ans in answered_questions if ans['is_correct'])
-        incorrect_answers = total_questions - correct_answers
-        accuracy = correct_answers / total_questions if total_questions > 0 else 0
-        
-        total_time = sum(ans['time_taken'] for ans in answered_questions)
-        avg_time = total_time / total_questions if total_questions > 0 else 0
-        
-        # Difficulty breakdown
-        difficulty_breakdown = {}
-        topic_performance = {}
-        
-        for ans in answered_questions:
-            diff = ans['difficulty'].value
-            topic = ans['question'].topic
-            
-            # Difficulty breakdown
-            if diff not in difficulty_breakdown:
-                difficulty_breakdown[diff] = {'correct': 0, 'total': 0}
-            difficulty_breakdown[diff]['total'] += 1
-            if ans['is_correct']:
-                difficulty_breakdown[diff]['correct'] += 1
+        if total_questions >= VECTORIZED_STATS_MIN_ANSWERS:
+            correct_answers, total_time, difficulty_breakdown, topic_performance = \
+                _aggregate_answers_vectorized(answered_questions)
+        else:
+            # Single pass over the answers accumulating every statistic
+            correct_answers = 0
+            total_time = 0
+            difficulty_breakdown = defaultdict(lambda: {'correct': 0, 'total': 0})
+            topic_performance = defaultdict(lambda: [0, 0])  # topic -> [correct, total]
             
-            # Topic performance
-            if topic not in topic_performance:
-                topic_performance[topic] = {'correct': 0, 'total': 0}
-            topic_performance[topic]['total'] += 1
-            if ans['is_correct']:
-                topic_performance[topic]['correct'] += 1
+            for ans in answered_questions:
+                correct = 1 if ans['is_correct'] else 0
+                correct_answers += correct
+                total_time += ans['time_taken']
+                
+                diff_stats = difficulty_breakdown[ans['difficulty'].value]
+                diff_stats['total'] += 1
+                diff_stats['correct'] += correct
+                
+                topic_stats = topic_performance[ans['question'].topic]
+                topic_stats[0] += correct
+                topic_stats[1] += 1
+        
+        incorrect_answers = total_questions - correct_answers
+        accuracy = correct_answers / total_questions
+        avg_time = total_time / total_questions
         
         # Convert to percentages for topic performance
-        topic_percentages = {}
-        for topic, stats in topic_performance.items():
-            topic_percentages[topic] = stats['correct'] / stats['total'] if stats['total'] > 0 else 0
+        topic_percentages = {topic: correct / total for topic, (correct, total) in topic_performance.items()}
         
         stats = QuizStats(
             total_questions=total_questions,
@@ -309,18 +417,18 @@ async def get_quiz_stats(
             incorrect_answers=incorrect_answers,
             accuracy=accuracy,
             average_time_per_question=avg_time,
-            difficulty_breakdown=difficulty_breakdown,
+            difficulty_breakdown=dict(difficulty_breakdown),
             topic_performance=topic_percentages
         )
         
         return {
             "quiz_stats": stats,
-            "performance_trend": question_queue.performance_history,
+            "performance_trend": list(question_queue.performance_history),
             "queue_status": question_queue.get_queue_status()
         }
         
     except Exception as e:
-        logger.error(f"Error getting quiz stats: {str(e)}")
+        logger.error("Error getting quiz stats: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/questions/tree-structure")
@@ -340,7 +448,7 @@ async def get_question_tree_structure(
         }
         
     except Exception as e:
-        logger.error(f"Error getting tree structure: {str(e)}")
+        logger.error("Error getting tree structure: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/questions/search")
@@ -373,7 +481,7 @@ async def search_questions(
         }
         
     except Exception as e:
-        logger.error(f"Error searching questions: {str(e)}")
+        logger.error("Error searching questions: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/quiz/{quiz_id}/session")
@@ -385,12 +493,11 @@ async def end_quiz_session(
     End a quiz session and clean up resources
     """
     try:
-        if quiz_id in active_sessions:
-            del active_sessions[quiz_id]
+        if await session_store.delete_session(quiz_id):
             return {"message": "Quiz session ended successfully"}
         else:
             raise HTTPException(status_code=404, detail="Quiz session not found")
             
     except Exception as e:
-        logger.error(f"Error ending quiz session: {str(e)}")
+        logger.error("Error ending quiz session: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -5,18 +5,189 @@ Handles question generation, difficulty assessment, and content processing.
 
 import openai
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+import httpx
 import json
+import orjson
+import os
+import random
 import re
 import asyncio
 import logging
-from typing import List, Dict, Optional
+from functools import lru_cache
+from itertools import islice
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
 
-from backend.models.question import QuestionCreate, QuestionOption, DifficultyLevel, QuestionType
+from backend.models.question import (
+    QuestionCreate, QuestionOption, DifficultyLevel, QuestionType, QuestionSchema, QuestionBatchSchema
+)
+from backend.services.llm_cache import LLMCache, create_llm_cache
+from backend.services.semantic_cache import SemanticCache
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Patterns compiled once at import instead of looked up on every call
+_WORD_RE = re.compile(r'\b[a-zA-Z]{3,}\b')
+_SENT_RE = re.compile(r'[.!?]+')
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of',
+    'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have',
+    'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should'
+})
+
+OPENAI_MODEL = "gpt-3.5-turbo"
+SYSTEM_PROMPT = "You are an expert educator who creates high-quality quiz questions. Always answer by calling the provided function."
+OPENAI_TEMPERATURE = 0.7
+# Output token limit of OPENAI_MODEL; a request asking for more is rejected outright
+OPENAI_MAX_OUTPUT_TOKENS = 4096
+QUESTION_MAX_TOKENS = 500
+GEMINI_MODEL = "gemini-1.5-flash"
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+SUBFIELD_SYSTEM_PROMPT = "You are an expert educator writing parts of a quiz question. Respond with a JSON object."
+
+# Question generation prompts; the text is substituted with str.replace so the
+# JSON examples need no brace escaping
+_MC_PROMPT = """
+    Based on the following text, generate a multiple-choice question with 4 options.
+    Text: {text}
+    
+    Requirements:
+    - Create one clear, specific question about the main concepts
+    - Provide exactly 4 answer options (A, B, C, D)
+    - Only one option should be correct
+    - Include brief explanations for why the correct answer is right
+    - Assess difficulty level: beginner, intermediate, advanced, or expert
+    - Identify the main topic/subject area
+    
+    Format your response as JSON:
+    {
+        "question": "Your question here?",
+        "options": [
+            {"text": "Option A", "is_correct": false},
+            {"text": "Option B", "is_correct": true},
+            {"text": "Option C", "is_correct": false},
+            {"text": "Option D", "is_correct": false}
+        ],
+        "explanation": "Why the correct answer is right",
+        "difficulty": "intermediate",
+        "subject": "Subject area",
+        "topic": "Specific topic"
+    }
+    """
+
+_TF_PROMPT = """
+    Based on the following text, generate a true/false question.
+    Text: {text}
+    
+    Create a statement that can be definitively marked as true or false based on the content.
+    
+    Format your response as JSON:
+    {
+        "question": "Your statement here",
+        "correct_answer": "true",
+        "explanation": "Explanation of the answer",
+        "difficulty": "beginner",
+        "subject": "Subject area",
+        "topic": "Specific topic"
+    }
+    """
+
+# One request covering several chunks; items follow the single-question formats above
+_BATCH_PROMPT = """
+    Generate exactly {count} quiz questions, one for each numbered chunk of text below.
+    Question types, in chunk order: {types}
+
+    For multiple_choice items provide exactly 4 options with only one correct.
+    For true_false items provide a statement and "correct_answer" of "true" or "false".
+    Each item needs "question", "explanation", "difficulty" (beginner, intermediate,
+    advanced, or expert), "subject" and "topic", plus "options" or "correct_answer".
+
+    {chunks}
+
+    Call create_questions with a "questions" array whose item i is the question for Chunk i.
+    """
+
+# Function-calling tools whose parameters are the pydantic schemas, so OpenAI
+# returns arguments that validate directly instead of free-form text
+QUESTION_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "create_question",
+        "description": "Record one generated quiz question",
+        "parameters": QuestionSchema.model_json_schema()
+    }
+}
+QUESTION_BATCH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "create_questions",
+        "description": "Record the generated quiz questions, item i for Chunk i",
+        "parameters": QuestionBatchSchema.model_json_schema()
+    }
+}
+
+
+def _tool_choice(tool: Dict) -> Dict:
+    """Force the model to call the given tool"""
+    return {"type": "function", "function": {"name": tool["function"]["name"]}}
+
+
+# Mock question texts depend only on (subject, term), so build each combination once
+@lru_cache(maxsize=128)
+def _mock_mc_texts(subject: str, term: str) -> Tuple[str, str, str, str, str, str, str]:
+    """(question, topic, correct option, three wrong options, explanation)"""
+    return (
+        f"What is the significance of {term} in the context of {subject}?",
+        term.title(),
+        f"It is fundamental to understanding {subject}",
+        f"It has no relevance to {subject}",
+        f"It only applies in advanced {subject}",
+        f"It is outdated in modern {subject}",
+        f"The term {term} is indeed significant in {subject} based on the provided text content."
+    )
+
+
+@lru_cache(maxsize=128)
+def _mock_tf_texts(subject: str, term: str) -> Tuple[str, str, str]:
+    """(statement, topic, explanation)"""
+    return (
+        f"{term.title()} is a fundamental concept in {subject}.",
+        term.title(),
+        f"Based on the provided text, {term} appears to be relevant to {subject}."
+    )
+
+
+# Retry budget (AI_RETRY_*) for transient provider errors and invalid output
+AI_RETRY_ATTEMPTS = int(os.getenv("AI_RETRY_ATTEMPTS", "3"))
+AI_RETRY_DELAY = float(os.getenv("AI_RETRY_DELAY", "2"))
+AI_RETRY_MAX_DELAY = 20.0
+INVALID_OUTPUT_RETRY_PROMPT = "Your previous response was not valid JSON for the schema, retry:"
+GEMINI_TRANSIENT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+# Requests spanning at least this many chunks are sent to OpenAI as batched calls of at
+# most BATCH_MAX_QUESTIONS chunks, so each call's output fits the model's token limit
+BATCH_MIN_QUESTIONS = 3
+BATCH_MAX_QUESTIONS = OPENAI_MAX_OUTPUT_TOKENS // QUESTION_MAX_TOKENS
+DEFAULT_QUESTION_TYPES = [QuestionType.MULTIPLE_CHOICE, QuestionType.TRUE_FALSE]
+
+# OpenAI Batch API polling (exponential backoff between status checks)
+BATCH_POLL_INITIAL_DELAY = 5
+BATCH_POLL_MAX_DELAY = 300
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# Provider responses shared by every generator instance
+shared_llm_cache = create_llm_cache(os.getenv("REDIS_URL"))
+shared_semantic_cache = SemanticCache()
+
 
 class AIQuestionGenerator:
     """
@@ -24,64 +195,42 @@ class AIQuestionGenerator:
     Generates questions from text content with difficulty assessment
     """
 
-    def __init__(self, api_key: Optional[str] = None, provider: str = "openai"):
+    _PROMPTS: Dict[str, str] = {"multiple_choice": _MC_PROMPT, "true_false": _TF_PROMPT}
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        provider: str = "openai",
+        max_concurrency: Optional[int] = None,
+        qpm: Optional[int] = None,
+        cache: Optional[LLMCache] = None,
+        semantic_cache: Optional[SemanticCache] = None
+    ):
         self.api_key = api_key
         self.provider = provider.lower()
         self.mock_mode = not api_key  # Use mock responses if no API key
 
+        # Cap in-flight provider calls, and optionally space call starts to a queries-per-minute budget
+        self.max_concurrency = max_concurrency or int(os.getenv("AI_MAX_CONCURRENCY", "10"))
+        qpm = qpm or int(os.getenv("AI_QPM", "0"))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._min_interval = 60.0 / qpm if qpm else 0.0
+        self._next_slot = 0.0
+        self._openai_client: Optional[openai.AsyncOpenAI] = None
+        self.cache = cache if cache is not None else shared_llm_cache
+        # Off by default: each lookup costs an embedding call
+        if semantic_cache is None and os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true":
+            semantic_cache = shared_semantic_cache
+        self.semantic_cache = semantic_cache
+        # Split multiple-choice generation into small parallel calls (more requests, shorter decodes)
+        self.parallel_fields = os.getenv("AI_PARALLEL_FIELDS", "false").lower() == "true"
+
+        self._gemini_model = None
         if self.api_key:
-            if self.provider == "openai":
-                openai.api_key = api_key
-            elif self.provider == "gemini":
+            if self.provider == "gemini":
                 genai.configure(api_key=api_key)
-
-        # Question generation prompts
-        self.generation_prompts = {
-            "multiple_choice": """
-            Based on the following text, generate a multiple-choice question with 4 options.
-            Text: {text}
-            
-            Requirements:
-            - Create one clear, specific question about the main concepts
-            - Provide exactly 4 answer options (A, B, C, D)
-            - Only one option should be correct
-            - Include brief explanations for why the correct answer is right
-            - Assess difficulty level: beginner, intermediate, advanced, or expert
-            - Identify the main topic/subject area
-            
-            Format your response as JSON:
-            {{
-                "question": "Your question here?",
-                "options": [
-                    {{"text": "Option A", "is_correct": false}},
-                    {{"text": "Option B", "is_correct": true}},
-                    {{"text": "Option C", "is_correct": false}},
-                    {{"text": "Option D", "is_correct": false}}
-                ],
-                "explanation": "Why the correct answer is right",
-                "difficulty": "intermediate",
-                "subject": "Subject area",
-                "topic": "Specific topic"
-            }}
-            """,
-
-            "true_false": """
-            Based on the following text, generate a true/false question.
-            Text: {text}
-            
-            Create a statement that can be definitively marked as true or false based on the content.
-            
-            Format your response as JSON:
-            {{
-                "question": "Your statement here",
-                "correct_answer": "true",
-                "explanation": "Explanation of the answer",
-                "difficulty": "beginner",
-                "subject": "Subject area",
-                "topic": "Specific topic"
-            }}
-            """
-        }
+                # Built once and reused for every call
+                self._gemini_model = genai.GenerativeModel(GEMINI_MODEL)
 
     async def generate_questions_from_text(
         self,
@@ -96,26 +245,98 @@ class AIQuestionGenerator:
         if self.mock_mode:
             return self._generate_mock_questions(text, question_count, subject)
 
-        if not question_types:
-            question_types = [QuestionType.MULTIPLE_CHOICE, QuestionType.TRUE_FALSE]
+        question_types = question_types or DEFAULT_QUESTION_TYPES
+        text_chunks = self._split_text_into_chunks(text)[:question_count]
+
+        # One call for many chunks shares the system prompt and request overhead; sub-batches
+        # that fit the output limit run concurrently
+        if self.provider == "openai" and len(text_chunks) >= BATCH_MIN_QUESTIONS:
+            starts = range(0, len(text_chunks), BATCH_MAX_QUESTIONS)
+            batches = await asyncio.gather(*(
+                self._generate_batch_with_openai(
+                    text_chunks[start:start + BATCH_MAX_QUESTIONS], question_types, subject,
+                    difficulty_preference, offset=start
+                )
+                for start in starts
+            ))
+
+            # Only the sub-batches that failed fall back to one call per chunk
+            failed = [start for start, batch in zip(starts, batches) if batch is None]
+            if failed:
+                logger.info("%d of %d batched calls failed, falling back to one call per chunk",
+                            len(failed), len(batches))
+            fallbacks = dict(zip(failed, await asyncio.gather(*(
+                self._generate_per_chunk(
+                    text_chunks[start:start + BATCH_MAX_QUESTIONS], question_types, subject,
+                    difficulty_preference, offset=start
+                )
+                for start in failed
+            ))))
+            return [
+                question
+                for start, batch in zip(starts, batches)
+                for question in (fallbacks[start] if batch is None else batch)
+            ]
+
+        return await self._generate_per_chunk(text_chunks, question_types, subject, difficulty_preference)
+
+    async def _generate_per_chunk(
+        self,
+        text_chunks: List[str],
+        question_types: List[QuestionType],
+        subject: str,
+        difficulty_preference: Optional[DifficultyLevel] = None,
+        offset: int = 0
+    ) -> List[QuestionCreate]:
+        """One concurrent provider round-trip per chunk, dropping chunks that fail"""
+        tasks = self._question_tasks(text_chunks, question_types, subject, difficulty_preference, offset)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
 
         questions = []
-        text_chunks = self._split_text_into_chunks(text)
+        for i, result in enumerate(results, offset):
+            if isinstance(result, Exception):
+                logger.error("Error generating question %d: %s", i + 1, result)
+            elif result:
+                questions.append(result)
+
+        return questions
+
+    async def iter_questions_from_text(
+        self,
+        text: str,
+        question_count: int = 5,
+        question_types: List[QuestionType] = None,
+        subject: str = "General",
+        difficulty_preference: Optional[DifficultyLevel] = None
+    ) -> AsyncIterator[QuestionCreate]:
+        """Yield questions in completion order as the AI provider returns them"""
 
-        for i, chunk in enumerate(text_chunks[:question_count]):
-            question_type = question_types[i % len(question_types)]
+        if self.mock_mode:
+            for question in self._generate_mock_questions(text, question_count, subject):
+                yield question
+            return
 
+        text_chunks = self._split_text_into_chunks(text)[:question_count]
+        tasks = self._question_tasks(
+            text_chunks, question_types or DEFAULT_QUESTION_TYPES, subject, difficulty_preference
+        )
+        for next_done in asyncio.as_completed(tasks):
             try:
-                question = await self._generate_single_question(
-                    chunk, question_type, subject, difficulty_preference
-                )
-                if question:
-                    questions.append(question)
+                question = await next_done
             except Exception as e:
-                logger.error(f"Error generating question {i+1}: {str(e)}")
+                logger.error("Error generating question: %s", e)
                 continue
-
-        return questions
+            if question:
+                yield question
+
+    def _question_tasks(self, text_chunks, question_types, subject, difficulty_preference, offset=0):
+        """One single-question coroutine per text chunk, cycling through the question types from offset"""
+        return [
+            self._generate_single_question(
+                chunk, question_types[i % len(question_types)], subject, difficulty_preference
+            )
+            for i, chunk in enumerate(text_chunks, offset)
+        ]
 
     async def _generate_single_question(
         self,
@@ -127,66 +348,477 @@ class AIQuestionGenerator:
         """Generate a single question using the chosen AI provider"""
 
         if self.provider == "openai":
+            if self.parallel_fields and question_type == QuestionType.MULTIPLE_CHOICE:
+                question = await self._generate_multiple_choice_parallel(text, subject, difficulty_preference)
+                if question:
+                    return question
             return await self._generate_with_openai(text, question_type, subject, difficulty_preference)
         elif self.provider == "gemini":
             return await self._generate_with_gemini(text, question_type, subject, difficulty_preference)
         else:
-            logger.error(f"Unsupported AI provider: {self.provider}")
+            logger.error("Unsupported AI provider: %s", self.provider)
             return None
 
+    def _get_openai_client(self) -> openai.AsyncOpenAI:
+        """Shared OpenAI client so every call reuses one pooled HTTP connection set"""
+        if self._openai_client is None:
+            self._openai_client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                # The client retries 429s, 5xx and connection errors with jittered exponential backoff
+                max_retries=AI_RETRY_ATTEMPTS,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=self.max_concurrency)
+                )
+            )
+        return self._openai_client
+
+    async def aclose(self):
+        """Close the pooled OpenAI HTTP client, if one was created"""
+        if self._openai_client is not None:
+            await self._openai_client.close()
+            self._openai_client = None
+
+    async def _throttle(self):
+        """Wait for the next call slot when a QPM budget is configured"""
+        if not self._min_interval:
+            return
+        now = asyncio.get_running_loop().time()
+        wait = self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + self._min_interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    async def _collect_streamed_arguments(stream) -> str:
+        """
+        Accumulate streamed tool-call arguments, validating as they arrive
+        Aborts the stream as soon as the output can't be a JSON object, and stops
+        reading once a complete object has been received.
+        """
+        decoder = json.JSONDecoder()
+        parts = []
+        started = False
+        try:
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.tool_calls:
+                    continue
+                fragment = chunk.choices[0].delta.tool_calls[0].function.arguments or ""
+                parts.append(fragment)
+
+                if not started:
+                    prefix = "".join(parts).lstrip()
+                    if not prefix:
+                        continue
+                    if prefix[0] != "{":
+                        raise ValueError("Streamed response is not a JSON object")
+                    started = True
+
+                if "}" in fragment:
+                    buffer = "".join(parts).lstrip()
+                    try:
+                        obj, end = decoder.raw_decode(buffer)
+                    except json.JSONDecodeError:
+                        continue
+                    return buffer[:end]
+        finally:
+            # The pinned SDK's AsyncStream has no close(); release the underlying HTTP response
+            await stream.response.aclose()
+
+        return "".join(parts)
+
+    async def _embed(self, text: str) -> List[float]:
+        """Embed text for semantic cache lookups"""
+        async with self._semaphore:
+            response = await self._get_openai_client().embeddings.create(model=EMBEDDING_MODEL, input=text)
+        return response.data[0].embedding
+
+    def _build_openai_messages(self, text, question_type, difficulty_preference=None):
+        """Chat messages asking for a single question of the given type"""
+        prompt = self._PROMPTS.get(question_type.value, _MC_PROMPT)
+        formatted_prompt = prompt.replace("{text}", text)
+
+        if difficulty_preference:
+            formatted_prompt += f"\nPreferred difficulty level: {difficulty_preference.value}"
+
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": formatted_prompt}
+        ]
+
+    async def _request_openai_question(self, messages) -> str:
+        """One streamed create_question call, returning the tool-call arguments"""
+        async with self._semaphore:
+            await self._throttle()
+            stream = await self._get_openai_client().chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=messages,
+                temperature=OPENAI_TEMPERATURE,
+                tools=[QUESTION_TOOL],
+                tool_choice=_tool_choice(QUESTION_TOOL),
+                max_tokens=QUESTION_MAX_TOKENS,
+                stream=True
+            )
+            return await self._collect_streamed_arguments(stream)
+
     async def _generate_with_openai(self, text, question_type, subject, difficulty_preference):
         """Generate question using OpenAI API"""
         try:
-            prompt = self.generation_prompts.get(question_type.value, self.generation_prompts["multiple_choice"])
-            formatted_prompt = prompt.format(text=text)
+            messages = self._build_openai_messages(text, question_type, difficulty_preference)
+            cache_key = LLMCache.make_key(OPENAI_MODEL, messages, OPENAI_TEMPERATURE)
+            ai_response = await self.cache.get(cache_key)
+
+            # On an exact miss, near-duplicate texts can still be served from the semantic cache
+            embedding = None
+            semantic_bucket = f"{question_type.value}:{difficulty_preference.value if difficulty_preference else ''}"
+            if ai_response is None and self.semantic_cache is not None:
+                embedding = await self._embed(text)
+                ai_response = self.semantic_cache.get(semantic_bucket, embedding)
+
+            # Transient API errors are retried by the client; invalid output is re-prompted here
+            from_provider = False
+            for attempt in range(AI_RETRY_ATTEMPTS):
+                try:
+                    if ai_response is None:
+                        ai_response = ""
+                        ai_response = await self._request_openai_question(messages)
+                        from_provider = True
+                    schema = QuestionSchema.model_validate_json(ai_response)
+                except ValueError as e:
+                    # Covers both a stream aborted as non-JSON and a pydantic ValidationError
+                    logger.warning("Invalid OpenAI question output (attempt %d): %s", attempt + 1, e)
+                    messages = messages + [{"role": "user", "content": f"{INVALID_OUTPUT_RETRY_PROMPT}\n{ai_response}"}]
+                    ai_response = None
+                    continue
+
+                # Only cache output that validated
+                if from_provider:
+                    await self.cache.set(cache_key, ai_response)
+                    if embedding is not None:
+                        self.semantic_cache.set(semantic_bucket, embedding, ai_response)
+                return self._question_from_schema(schema, text, question_type, subject)
+
+            logger.error("OpenAI returned no valid question after %d attempts", AI_RETRY_ATTEMPTS)
+            return None
 
-            if difficulty_preference:
-                formatted_prompt += f"\nPreferred difficulty level: {difficulty_preference.value}"
+        except Exception as e:
+            logger.error("OpenAI API error: %s", e)
+            return None
+
+    async def _complete_json(self, prompt: str, max_tokens: int, required_keys: Tuple[str, ...]) -> Dict:
+        """
+        Small JSON-mode completion used for the parallel sub-field prompts
+        Raises ValueError unless the reply is a JSON object with every required key; only
+        replies that pass are cached, so a truncated reply is never served again.
+        """
+        messages = [
+            {"role": "system", "content": SUBFIELD_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        cache_key = LLMCache.make_key(OPENAI_MODEL, messages, OPENAI_TEMPERATURE)
+        ai_response = await self.cache.get(cache_key)
+        from_provider = ai_response is None
+
+        if from_provider:
+            async with self._semaphore:
+                await self._throttle()
+                response = await self._get_openai_client().chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=messages,
+                    temperature=OPENAI_TEMPERATURE,
+                    response_format={"type": "json_object"},
+                    max_tokens=max_tokens
+                )
+            ai_response = response.choices[0].message.content
 
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert educator who creates high-quality quiz questions."},
-                    {"role": "user", "content": formatted_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=500
+        # orjson.JSONDecodeError is a ValueError
+        result = orjson.loads(ai_response)
+        if not isinstance(result, dict) or any(key not in result for key in required_keys):
+            raise ValueError(f"Sub-field reply is missing one of {required_keys}")
+
+        # Only cache output that validated
+        if from_provider:
+            await self.cache.set(cache_key, ai_response)
+        return result
+
+    async def _generate_multiple_choice_parallel(self, text, subject, difficulty_preference=None):
+        """
+        Generate a multiple-choice question from short sub-field prompts
+        The stem and answer come first; distractors, explanation and metadata then
+        decode concurrently, so the critical path is two short completions.
+        """
+        try:
+            difficulty_hint = f" Target difficulty: {difficulty_preference.value}." if difficulty_preference else ""
+            stem = await self._complete_json(
+                f'From this text, write one multiple-choice question stem and its correct answer.{difficulty_hint}\n'
+                f'Text: {text}\nReturn {{"question": "...", "answer": "..."}}',
+                max_tokens=120,
+                required_keys=("question", "answer")
+            )
+            question, answer = stem["question"], stem["answer"]
+
+            distractors, explanation, metadata = await asyncio.gather(
+                self._complete_json(
+                    f'Question: {question}\nCorrect answer: {answer}\n'
+                    f'Write 3 plausible but wrong answers. Return {{"wrong_answers": ["...", "...", "..."]}}',
+                    max_tokens=90,
+                    required_keys=("wrong_answers",)
+                ),
+                self._complete_json(
+                    f'Question: {question}\nCorrect answer: {answer}\n'
+                    f'Explain briefly why the answer is correct. Return {{"explanation": "..."}}',
+                    max_tokens=90,
+                    required_keys=("explanation",)
+                ),
+                self._complete_json(
+                    f'Text: {text}\nQuestion: {question}\n'
+                    f'Rate difficulty (beginner, intermediate, advanced, or expert) and name the topic.'
+                    f' Return {{"difficulty": "...", "topic": "..."}}',
+                    max_tokens=30,
+                    required_keys=("difficulty", "topic")
+                )
             )
 
-            ai_response = response.choices[0].message.content
-            question_data = self._parse_ai_response(ai_response, question_type)
+            options = [{"text": answer, "is_correct": True}]
+            options += [{"text": wrong, "is_correct": False} for wrong in distractors["wrong_answers"][:3]]
+            random.shuffle(options)
 
-            if question_data:
-                return self._create_question_from_data(question_data, text, question_type, subject)
+            schema = QuestionSchema.model_validate({
+                "question": question,
+                "options": options,
+                "explanation": explanation["explanation"],
+                "difficulty": metadata["difficulty"],
+                "topic": metadata["topic"]
+            })
+            return self._question_from_schema(schema, text, QuestionType.MULTIPLE_CHOICE, subject)
+
+        except Exception as e:
+            logger.error("Parallel multiple-choice generation failed, using a single call: %s", e)
+            return None
+
+    async def _generate_batch_with_openai(
+        self,
+        chunks: List[str],
+        question_types: List[QuestionType],
+        subject: str,
+        difficulty_preference: Optional[DifficultyLevel] = None,
+        offset: int = 0
+    ) -> Optional[List[QuestionCreate]]:
+        """
+        Generate one question per chunk in a single OpenAI call; None if the batch fails
+        Question types cycle from `offset`, the position of the first chunk in the whole request.
+        """
+        try:
+            chunk_types = [question_types[i % len(question_types)] for i in range(offset, offset + len(chunks))]
+            numbered_chunks = "\n\n".join(f"Chunk {i + 1}: {chunk}" for i, chunk in enumerate(chunks))
+            prompt = _BATCH_PROMPT.format(
+                count=len(chunks),
+                types=", ".join(question_type.value for question_type in chunk_types),
+                chunks=numbered_chunks
+            )
+            if difficulty_preference:
+                prompt += f"\nPreferred difficulty level: {difficulty_preference.value}"
+
+            messages = [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ]
+            cache_key = LLMCache.make_key(OPENAI_MODEL, messages, OPENAI_TEMPERATURE)
+            ai_response = await self.cache.get(cache_key)
+
+            if ai_response is None:
+                async with self._semaphore:
+                    await self._throttle()
+                    response = await self._get_openai_client().chat.completions.create(
+                        model=OPENAI_MODEL,
+                        messages=messages,
+                        temperature=OPENAI_TEMPERATURE,
+                        tools=[QUESTION_BATCH_TOOL],
+                        tool_choice=_tool_choice(QUESTION_BATCH_TOOL),
+                        max_tokens=min(QUESTION_MAX_TOKENS * len(chunks), OPENAI_MAX_OUTPUT_TOKENS)
+                    )
+                ai_response = response.choices[0].message.tool_calls[0].function.arguments
+
+            items = QuestionBatchSchema.model_validate_json(ai_response).questions
+            if len(items) != len(chunks):
+                logger.error("Batched OpenAI response did not contain %d questions", len(chunks))
+                return None
+            await self.cache.set(cache_key, ai_response)
+
+            return [
+                self._question_from_schema(item, chunk, question_type, subject)
+                for item, chunk, question_type in zip(items, chunks, chunk_types)
+            ]
 
         except Exception as e:
-            logger.error(f"OpenAI API error: {str(e)}")
+            logger.error("OpenAI batch API error: %s", e)
             return None
 
+    async def generate_questions_batch_api(
+        self,
+        jobs: List[Tuple[str, QuestionType, str]]
+    ) -> List[QuestionCreate]:
+        """
+        Generate questions through the OpenAI Batch API for offline work
+        Each job is (text, question_type, subject). Batches cost about half as much as
+        direct calls but can take up to 24 hours, so only use this where latency doesn't matter.
+        """
+        if self.mock_mode:
+            return [
+                await self._generate_mock_single_question(text, question_type, subject)
+                for text, question_type, subject in jobs
+            ]
+
+        client = self._get_openai_client()
+        lines = [
+            json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": OPENAI_MODEL,
+                    "messages": self._build_openai_messages(text, question_type),
+                    "temperature": OPENAI_TEMPERATURE,
+                    "tools": [QUESTION_TOOL],
+                    "tool_choice": _tool_choice(QUESTION_TOOL),
+                    "max_tokens": QUESTION_MAX_TOKENS
+                }
+            })
+            for i, (text, question_type, _subject) in enumerate(jobs)
+        ]
+        input_file = await client.files.create(
+            file=("questions.jsonl", "\n".join(lines).encode()), purpose="batch"
+        )
+
+        # The pinned SDK predates client.batches, so call the endpoint through the generic client
+        batch = await client.post(
+            "/batches",
+            cast_to=Dict[str, Any],
+            body={"input_file_id": input_file.id, "endpoint": "/v1/chat/completions", "completion_window": "24h"}
+        )
+
+        delay = BATCH_POLL_INITIAL_DELAY
+        while batch["status"] not in BATCH_TERMINAL_STATUSES:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BATCH_POLL_MAX_DELAY)
+            batch = await client.get(f"/batches/{batch['id']}", cast_to=Dict[str, Any])
+
+        if batch["status"] != "completed" or not batch.get("output_file_id"):
+            logger.error("OpenAI batch %s ended with status %s", batch["id"], batch["status"])
+            return []
+
+        output = await client.files.content(batch["output_file_id"])
+        responses = {}
+        for line in output.content.splitlines():
+            if not line.strip():
+                continue
+            result = orjson.loads(line)
+            body = (result.get("response") or {}).get("body")
+            if body:
+                tool_call = body["choices"][0]["message"]["tool_calls"][0]
+                responses[result["custom_id"]] = tool_call["function"]["arguments"]
+
+        questions = []
+        for i, (text, question_type, subject) in enumerate(jobs):
+            arguments = responses.get(str(i))
+            if arguments is None:
+                logger.error("Batch job %d returned no question", i)
+                continue
+            try:
+                schema = QuestionSchema.model_validate_json(arguments)
+                questions.append(self._question_from_schema(schema, text, question_type, subject))
+            except Exception as e:
+                logger.error("Batch job %d returned an invalid question: %s", i, e)
+
+        return questions
+
+    async def _call_gemini_with_retries(self, prompt: str):
+        """Call Gemini, retrying rate limits and server errors with jittered exponential backoff"""
+        for attempt in range(AI_RETRY_ATTEMPTS):
+            try:
+                return await self._gemini_model.generate_content_async(prompt)
+            except GEMINI_TRANSIENT_ERRORS as e:
+                if attempt == AI_RETRY_ATTEMPTS - 1:
+                    raise
+                delay = min(AI_RETRY_DELAY * 2 ** attempt, AI_RETRY_MAX_DELAY) * random.uniform(0.5, 1.0)
+                logger.warning("Gemini call failed (%s), retrying in %.1fs", e, delay)
+                await asyncio.sleep(delay)
+
     async def _generate_with_gemini(self, text, question_type, subject, difficulty_preference):
         """Generate question using Gemini API"""
         try:
-            prompt = self.generation_prompts.get(question_type.value, self.generation_prompts["multiple_choice"])
-            formatted_prompt = prompt.format(text=text)
+            prompt = self._PROMPTS.get(question_type.value, _MC_PROMPT)
+            formatted_prompt = prompt.replace("{text}", text)
 
             if difficulty_preference:
                 formatted_prompt += f"\nPreferred difficulty level: {difficulty_preference.value}"
 
-            def call_gemini():
-                model = genai.GenerativeModel("gemini-1.5-flash")
-                response = model.generate_content(formatted_prompt)
-                return response.text
-
-            ai_response = await asyncio.to_thread(call_gemini)
-            question_data = self._parse_ai_response(ai_response, question_type)
-
-            if question_data:
-                return self._create_question_from_data(question_data, text, question_type, subject)
+            # Gemini uses its default temperature, recorded as None in the key
+            cache_key = LLMCache.make_key(GEMINI_MODEL, [{"role": "user", "content": formatted_prompt}], None)
+            ai_response = await self.cache.get(cache_key)
+
+            # Transient API errors are retried in _call_gemini_with_retries; invalid output is re-prompted here
+            prompt = formatted_prompt
+            from_provider = False
+            for attempt in range(AI_RETRY_ATTEMPTS):
+                try:
+                    if ai_response is None:
+                        ai_response = ""
+                        async with self._semaphore:
+                            await self._throttle()
+                            response = await self._call_gemini_with_retries(prompt)
+                        ai_response = response.text
+                        from_provider = True
+                    # The pinned Gemini SDK has no response_schema, so validate the parsed JSON against it instead
+                    question_data = self._parse_ai_response(ai_response, question_type)
+                    if question_data is None:
+                        raise ValueError("Response contains no JSON object")
+                    schema = QuestionSchema.model_validate(question_data)
+                except ValueError as e:
+                    logger.warning("Invalid Gemini question output (attempt %d): %s", attempt + 1, e)
+                    prompt = f"{formatted_prompt}\n{INVALID_OUTPUT_RETRY_PROMPT}\n{ai_response}"
+                    ai_response = None
+                    continue
+
+                # Only cache output that validated
+                if from_provider:
+                    await self.cache.set(cache_key, ai_response)
+                return self._question_from_schema(schema, text, question_type, subject)
+
+            logger.error("Gemini returned no valid question after %d attempts", AI_RETRY_ATTEMPTS)
+            return None
 
         except Exception as e:
-            logger.error(f"Gemini API error: {str(e)}")
+            logger.error("Gemini API error: %s", e)
             return None
 
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def assess_text_difficulty(text: str) -> DifficultyLevel:
+        """Estimate reading difficulty from average word and sentence length (memoized per text)"""
+        # One pass over the sentences keeping running totals
+        total_word_len = word_count = sentence_count = 0
+        for sentence in _SENT_RE.split(text):
+            words = sentence.split()
+            if not words:
+                continue
+            sentence_count += 1
+            word_count += len(words)
+            total_word_len += sum(map(len, words))
+
+        if not word_count:
+            return DifficultyLevel.BEGINNER
+
+        avg_word_length = total_word_len / word_count
+        avg_sentence_length = word_count / sentence_count
+
+        if avg_word_length >= 7 and avg_sentence_length >= 20:
+            return DifficultyLevel.EXPERT
+        if avg_word_length >= 6 or avg_sentence_length >= 20:
+            return DifficultyLevel.ADVANCED
+        if avg_word_length >= 5 or avg_sentence_length >= 12:
+            return DifficultyLevel.INTERMEDIATE
+        return DifficultyLevel.BEGINNER
+
     # ---------------- Mock and Helper Methods Below ----------------
 
     def _generate_mock_questions(self, text, count, subject):
@@ -209,80 +841,98 @@ class AIQuestionGenerator:
 
     def _create_mock_multiple_choice(self, key_terms, index, subject, text):
         term = key_terms[index % len(key_terms)] if key_terms else "concept"
+        question_text, topic, correct, wrong_1, wrong_2, wrong_3, explanation = _mock_mc_texts(subject, term)
         return QuestionCreate(
-            text=f"What is the significance of {term} in the context of {subject}?",
+            text=question_text,
             question_type=QuestionType.MULTIPLE_CHOICE,
             subject=subject,
-            topic=term.title(),
+            topic=topic,
             difficulty=DifficultyLevel.INTERMEDIATE,
             options=[
-                QuestionOption(text=f"It is fundamental to understanding {subject}", is_correct=True),
-                QuestionOption(text=f"It has no relevance to {subject}", is_correct=False),
-                QuestionOption(text=f"It only applies in advanced {subject}", is_correct=False),
-                QuestionOption(text=f"It is outdated in modern {subject}", is_correct=False)
+                QuestionOption(text=correct, is_correct=True),
+                QuestionOption(text=wrong_1, is_correct=False),
+                QuestionOption(text=wrong_2, is_correct=False),
+                QuestionOption(text=wrong_3, is_correct=False)
             ],
-            explanation=f"The term {term} is indeed significant in {subject} based on the provided text content.",
+            explanation=explanation,
             source_text=text[:200] + "..." if len(text) > 200 else text,
             ai_generated=True
         )
 
     def _create_mock_true_false(self, key_terms, index, subject, text):
         term = key_terms[index % len(key_terms)] if key_terms else "concept"
+        question_text, topic, explanation = _mock_tf_texts(subject, term)
         return QuestionCreate(
-            text=f"{term.title()} is a fundamental concept in {subject}.",
+            text=question_text,
             question_type=QuestionType.TRUE_FALSE,
             subject=subject,
-            topic=term.title(),
+            topic=topic,
             difficulty=DifficultyLevel.BEGINNER,
             correct_answer="true",
-            explanation=f"Based on the provided text, {term} appears to be relevant to {subject}.",
+            explanation=explanation,
             source_text=text[:200] + "..." if len(text) > 200 else text,
             ai_generated=True
         )
 
-    def _extract_key_terms(self, text):
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of',
-            'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have',
-            'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should'
-        }
-        words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-        key_terms = [word for word in words if word not in stop_words]
-        unique_terms = list(dict.fromkeys(key_terms))
-        return unique_terms[:10]
-
-    def _split_text_into_chunks(self, text, max_chunk_size=500):
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _extract_key_terms(text):
+        # Memoized per text (mock generation asks repeatedly), so return an immutable tuple.
+        # Scan lazily and stop as soon as ten unique terms are found
+        seen = set()
+        words = (match.group() for match in _WORD_RE.finditer(text.lower()))
+        return tuple(islice(
+            (word for word in words if word not in _STOP_WORDS and not (word in seen or seen.add(word))),
+            10
+        ))
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _split_text_into_chunks(text, max_chunk_size=500):
+        # Memoized per (text, size) like _extract_key_terms, so the chunks are a tuple
         if len(text) <= max_chunk_size:
-            return [text]
-        sentences = re.split(r'[.!?]+', text)
-        chunks, current_chunk = [], ""
+            return (text,)
+        sentences = _SENT_RE.split(text)
+        # Collect parts and join once per chunk rather than growing a string with +=
+        chunks, current_parts, current_len = [], [], 0
         for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= max_chunk_size:
-                current_chunk += sentence + ". "
+            if current_len + len(sentence) + 2 <= max_chunk_size:
+                current_parts.append(sentence)
+                current_parts.append(". ")
+                current_len += len(sentence) + 2
             else:
-                if current_chunk.strip():
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + ". "
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
-        return chunks
+                chunk = "".join(current_parts).strip()
+                if chunk:
+                    chunks.append(chunk)
+                current_parts, current_len = [sentence, ". "], len(sentence) + 2
+        chunk = "".join(current_parts).strip()
+        if chunk:
+            chunks.append(chunk)
+        return tuple(chunks)
 
     def _parse_ai_response(self, response, question_type):
+        # JSON mode returns a bare object, so try a direct parse before scanning for one
+        try:
+            data = orjson.loads(response.strip())
+            if isinstance(data, dict):
+                return data
+        except orjson.JSONDecodeError:
+            pass
         try:
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
+            json_match = _JSON_RE.search(response)
             if json_match:
-                return json.loads(json_match.group())
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse AI response as JSON: {str(e)}")
+                return orjson.loads(json_match.group())
+        except orjson.JSONDecodeError as e:
+            logger.error("Failed to parse AI response as JSON: %s", e)
         return None
 
-    def _create_question_from_data(self, data, source_text, question_type, subject):
-        difficulty_str = data.get('difficulty', 'intermediate').lower()
-        try:
-            difficulty = DifficultyLevel(difficulty_str)
-        except ValueError:
-            difficulty = DifficultyLevel.INTERMEDIATE
+    def _question_from_schema(self, schema: QuestionSchema, source_text, question_type, subject):
+        return self._create_question_from_data(
+            schema.model_dump(mode="json", exclude_none=True), source_text, question_type, subject
+        )
 
+    def _create_question_from_data(self, data, source_text, question_type, subject):
+        # Difficulty was already normalized by QuestionSchema
         options = []
         if question_type == QuestionType.MULTIPLE_CHOICE and 'options' in data:
             for opt_data in data['options']:
@@ -297,7 +947,7 @@ class AIQuestionGenerator:
             question_type=question_type,
             subject=data.get('subject', subject),
             topic=data.get('topic', 'General'),
-            difficulty=difficulty,
+            difficulty=data['difficulty'],
             options=options,
             correct_answer=data.get('correct_answer'),
             explanation=data.get('explanation', ''),
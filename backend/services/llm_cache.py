@@ -0,0 +1,120 @@
+"""
+LLM Cache - Exact-match cache for AI provider responses
+Identical (model, messages, temperature) requests are answered from the cache
+instead of repeating the provider round-trip. Uses Redis when REDIS_URL is
+configured so workers share entries, falling back to an in-process LRU.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Protocol
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_MAX_SIZE = int(os.getenv("LLM_CACHE_MAX_SIZE", "1024"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+
+
+class CacheBackend(Protocol):
+    """Storage interface used by LLMCache"""
+
+    async def get(self, key: str) -> Optional[str]: ...
+
+    async def set(self, key: str, value: str) -> None: ...
+
+    async def delete(self, key: str) -> None: ...
+
+
+class InMemoryLRUBackend:
+    """Bounded in-process cache evicting the least recently used entry"""
+
+    def __init__(self, max_size: int = LLM_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self.entries: "OrderedDict[str, str]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self.entries.pop(key, None)
+
+
+class RedisBackend:
+    """Redis-backed cache shared across workers, with a TTL per entry"""
+
+    def __init__(self, redis_url: str, ttl_seconds: int = LLM_CACHE_TTL_SECONDS):
+        self.redis = aioredis.from_url(redis_url, decode_responses=True)
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return f"llm:{key}"
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.redis.get(self._key(key))
+
+    async def set(self, key: str, value: str) -> None:
+        await self.redis.set(self._key(key), value, ex=self.ttl_seconds)
+
+    async def delete(self, key: str) -> None:
+        await self.redis.delete(self._key(key))
+
+
+class LLMCache:
+    """
+    Exact-match response cache with hit/miss counters
+    Keys are SHA-256 digests of the canonical request, so prompts are never stored as keys.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        self.backend = backend if backend is not None else InMemoryLRUBackend()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], temperature: Optional[float]) -> str:
+        """Hash the parts of a request that determine its response"""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature}, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.backend.get(key)
+        if value is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["hits"] += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        await self.backend.set(key, value)
+
+    async def delete(self, key: str) -> None:
+        await self.backend.delete(key)
+
+
+def create_llm_cache(redis_url: Optional[str] = None) -> LLMCache:
+    """Build an LLMCache on Redis when available, otherwise in memory"""
+    if redis_url:
+        if aioredis is None:
+            logger.warning("REDIS_URL is set but the redis package is not installed; using in-memory LLM cache")
+        else:
+            return LLMCache(RedisBackend(redis_url))
+    return LLMCache()
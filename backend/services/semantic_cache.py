@@ -0,0 +1,67 @@
+"""
+Semantic Cache - Similarity-based cache for AI provider responses
+Catches near-duplicate prompts (whitespace or paragraph differences) that the
+exact-match LLMCache misses, by comparing prompt embeddings with cosine similarity.
+"""
+
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1024"))
+
+
+class SemanticCache:
+    """
+    In-memory vector store of (embedding, response) pairs, partitioned into buckets
+    so only requests of the same kind (e.g. question type + difficulty) can match.
+    Embeddings are stored unit-normalized, so a single matrix-vector product gives
+    the cosine similarity against every cached entry.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embeddings: Dict[str, np.ndarray] = {}
+        self.responses: Dict[str, List[str]] = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def get(self, bucket: str, embedding: Sequence[float]) -> Optional[str]:
+        """Return the most similar cached response if it clears the threshold"""
+        matrix = self.embeddings.get(bucket)
+        query = self._normalize(embedding)
+        if matrix is None or query is None or matrix.shape[1] != query.shape[0]:
+            self.stats["misses"] += 1
+            return None
+
+        similarities = matrix @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        return self.responses[bucket][best]
+
+    def set(self, bucket: str, embedding: Sequence[float], response: str):
+        """Add an entry, evicting the oldest in the bucket past max_entries"""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+
+        matrix = self.embeddings.get(bucket)
+        if matrix is None or matrix.shape[1] != vector.shape[0]:
+            self.embeddings[bucket] = vector[np.newaxis, :]
+            self.responses[bucket] = [response]
+            return
+
+        self.embeddings[bucket] = np.vstack([matrix, vector])[-self.max_entries:]
+        self.responses[bucket] = (self.responses[bucket] + [response])[-self.max_entries:]
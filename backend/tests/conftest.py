@@ -0,0 +1,16 @@
+"""
+Shared pytest fixtures
+Async tests run on one event loop per session instead of a fresh loop per test.
+"""
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Session-wide event loop shared by every async test"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
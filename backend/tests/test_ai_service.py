@@ -5,13 +5,16 @@ Tests the AI question generation functionality.
 
 import pytest
 import asyncio
-import sys
-import os
+import json
+import re
+from types import SimpleNamespace
 
-# Add the parent directory to the path so we can import backend modules
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import httpx
+import openai
 
+from backend.services import ai_service
 from backend.services.ai_service import AIQuestionGenerator
+from backend.services.llm_cache import LLMCache
 from backend.models.question import QuestionType, DifficultyLevel
 
 class TestAIQuestionGenerator:
@@ -221,5 +224,286 @@ class TestAIQuestionGenerator:
         assert generator.provider == "unsupported"
         # Should still work in mock mode
 
+QUESTION_ARGUMENTS = json.dumps({
+    "question": "What do plants use to make food?",
+    "options": [{"text": "Sunlight", "is_correct": True}, {"text": "Salt", "is_correct": False}],
+    "explanation": "Photosynthesis converts light energy"
+})
+
+def _tool_call_chunk(arguments):
+    """Chat completion chunk carrying a fragment of tool-call arguments"""
+    return {
+        "id": "chunk", "object": "chat.completion.chunk", "created": 0, "model": "test",
+        "choices": [{
+            "index": 0,
+            "delta": {"tool_calls": [{"index": 0, "function": {"arguments": arguments}}]},
+            "finish_reason": None
+        }]
+    }
+
+class FakeAsyncStream:
+    """Async iterator shaped like the SDK's AsyncStream: chunks plus the underlying response"""
+    
+    def __init__(self, fragments):
+        self.chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(
+                tool_calls=[SimpleNamespace(function=SimpleNamespace(arguments=fragment))]
+            ))])
+            for fragment in fragments
+        ]
+        self.consumed = 0
+        self.response = SimpleNamespace(closed=False, aclose=self._aclose)
+    
+    async def _aclose(self):
+        self.response.closed = True
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+class TestOpenAIStreaming:
+    """Test streamed OpenAI generation against the pinned SDK"""
+    
+    @pytest.mark.asyncio
+    async def test_collect_streamed_arguments_closes_response(self):
+        """Test a complete object stops the read and the HTTP response is released"""
+        stream = FakeAsyncStream([QUESTION_ARGUMENTS[:20], QUESTION_ARGUMENTS[20:], "ignored trailing text"])
+        
+        arguments = await AIQuestionGenerator._collect_streamed_arguments(stream)
+        
+        assert json.loads(arguments) == json.loads(QUESTION_ARGUMENTS)
+        assert stream.consumed == 2
+        assert stream.response.closed
+    
+    @pytest.mark.asyncio
+    async def test_collect_streamed_arguments_aborts_non_json(self):
+        """Test output that can't be a JSON object aborts the stream and still closes it"""
+        stream = FakeAsyncStream(["Sure! Here", " is your question"])
+        
+        with pytest.raises(ValueError):
+            await AIQuestionGenerator._collect_streamed_arguments(stream)
+        assert stream.consumed == 1
+        assert stream.response.closed
+    
+    @pytest.mark.asyncio
+    async def test_generate_with_openai_streams_through_sdk(self):
+        """Test a question is generated end to end through the SDK's AsyncStream"""
+        def handler(request):
+            fragments = [QUESTION_ARGUMENTS[:20], QUESTION_ARGUMENTS[20:]]
+            body = "".join(f"data: {json.dumps(_tool_call_chunk(fragment))}\n\n" for fragment in fragments)
+            return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                                  content=(body + "data: [DONE]\n\n").encode())
+        
+        generator = AIQuestionGenerator(api_key="test-key", provider="openai", cache=LLMCache())
+        generator._openai_client = openai.AsyncOpenAI(
+            api_key="test-key", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+        
+        question = await generator._generate_with_openai(
+            "Plants make food through photosynthesis.", QuestionType.MULTIPLE_CHOICE, "Biology", None
+        )
+        
+        assert question is not None
+        assert question.text == "What do plants use to make food?"
+        assert [option.is_correct for option in question.options] == [True, False]
+
+class TestOpenAIBatchedGeneration:
+    """Test batched chat-completion generation for many chunks"""
+    
+    @pytest.mark.asyncio
+    async def test_large_request_split_into_sub_batches(self):
+        """Test a 20-question request becomes concurrent sub-batches within the output token limit"""
+        requests = []
+        
+        def handler(request):
+            body = json.loads(request.content)
+            count = len(re.findall(r"Chunk \d+:", body["messages"][1]["content"]))
+            requests.append((count, body["max_tokens"]))
+            arguments = json.dumps({"questions": [json.loads(QUESTION_ARGUMENTS)] * count})
+            return httpx.Response(200, json={
+                "id": "completion", "object": "chat.completion", "created": 0, "model": "test",
+                "choices": [{"index": 0, "finish_reason": "tool_calls", "message": {
+                    "role": "assistant", "content": None,
+                    "tool_calls": [{"id": "call", "type": "function", "function": {
+                        "name": "create_questions", "arguments": arguments
+                    }}]
+                }}]
+            })
+        
+        generator = AIQuestionGenerator(api_key="test-key", provider="openai", cache=LLMCache())
+        generator._openai_client = openai.AsyncOpenAI(
+            api_key="test-key", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+        text = ". ".join(f"Sentence {i} " + "about photosynthesis " * 20 for i in range(20))
+        
+        questions = await generator.generate_questions_from_text(text, question_count=20, subject="Biology")
+        
+        assert len(questions) == 20
+        assert sorted(count for count, _ in requests) == [4, 8, 8]
+        assert all(max_tokens <= ai_service.OPENAI_MAX_OUTPUT_TOKENS for _, max_tokens in requests)
+        assert sorted(max_tokens for _, max_tokens in requests) == [2000, 4000, 4000]
+
+class TestOpenAIBatchAPI:
+    """Test the Batch API flow against the pinned SDK over a mocked transport"""
+    
+    @pytest.mark.asyncio
+    async def test_generate_questions_batch_api(self, monkeypatch):
+        """Test upload, creation, polling and output parsing of a batch"""
+        monkeypatch.setattr("backend.services.ai_service.BATCH_POLL_INITIAL_DELAY", 0)
+        requests = []
+        
+        def handler(request):
+            requests.append((request.method, request.url.path))
+            path = request.url.path
+            if path.endswith("/files") and request.method == "POST":
+                return httpx.Response(200, json={
+                    "id": "file-in", "object": "file", "bytes": 1, "created_at": 0,
+                    "filename": "questions.jsonl", "purpose": "batch", "status": "processed"
+                })
+            if path.endswith("/batches"):
+                assert json.loads(request.content)["input_file_id"] == "file-in"
+                return httpx.Response(200, json={"id": "batch-1", "status": "validating"})
+            if path.endswith("/batches/batch-1"):
+                return httpx.Response(200, json={
+                    "id": "batch-1", "status": "completed", "output_file_id": "file-out"
+                })
+            if path.endswith("/files/file-out/content"):
+                result = {
+                    "custom_id": "0",
+                    "response": {"body": {"choices": [{"message": {"tool_calls": [
+                        {"function": {"name": "create_question", "arguments": QUESTION_ARGUMENTS}}
+                    ]}}]}}
+                }
+                return httpx.Response(200, content=json.dumps(result).encode())
+            return httpx.Response(404)
+        
+        generator = AIQuestionGenerator(api_key="test-key", provider="openai", cache=LLMCache())
+        generator._openai_client = openai.AsyncOpenAI(
+            api_key="test-key", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+        
+        questions = await generator.generate_questions_batch_api([
+            ("Plants make food through photosynthesis.", QuestionType.MULTIPLE_CHOICE, "Biology"),
+            ("Water boils at 100 degrees Celsius.", QuestionType.TRUE_FALSE, "Physics")
+        ])
+        
+        # Job 1 has no output line, so only job 0 becomes a question
+        assert [q.text for q in questions] == ["What do plants use to make food?"]
+        assert questions[0].subject == "Biology"
+        assert ("GET", "/v1/batches/batch-1") in requests
+
+def _chat_completion(content):
+    """Non-streamed chat completion whose message content is `content`"""
+    return {
+        "id": "completion", "object": "chat.completion", "created": 0, "model": "test",
+        "choices": [{
+            "index": 0, "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content}
+        }]
+    }
+
+class TestOpenAISubfields:
+    """Test the JSON-mode sub-field completions behind parallel multiple-choice generation"""
+    
+    def setup_method(self):
+        self.cache = LLMCache()
+        self.generator = AIQuestionGenerator(api_key="test-key", provider="openai", cache=self.cache)
+    
+    def _reply_with(self, contents):
+        """Serve each content string in turn as a chat completion"""
+        contents = list(contents)
+        def handler(request):
+            return httpx.Response(200, json=_chat_completion(contents.pop(0)))
+        self.generator._openai_client = openai.AsyncOpenAI(
+            api_key="test-key", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("content", ['{"difficulty": "begin', '{"difficulty": "beginner"}', '["beginner"]'])
+    async def test_invalid_reply_not_cached(self, content):
+        """Test truncated, incomplete or non-object replies raise and are never cached"""
+        self._reply_with([content])
+        
+        with pytest.raises(ValueError):
+            await self.generator._complete_json("Rate it", max_tokens=30, required_keys=("difficulty", "topic"))
+        assert not self.cache.backend.entries
+    
+    @pytest.mark.asyncio
+    async def test_valid_reply_cached(self):
+        """Test a reply with every required key is cached and served from the cache next time"""
+        content = '{"difficulty": "beginner", "topic": "Plants"}'
+        self._reply_with([content])
+        
+        first = await self.generator._complete_json("Rate it", max_tokens=30, required_keys=("difficulty", "topic"))
+        second = await self.generator._complete_json("Rate it", max_tokens=30, required_keys=("difficulty", "topic"))
+        
+        assert first == second == {"difficulty": "beginner", "topic": "Plants"}
+        assert list(self.cache.backend.entries.values()) == [content]
+
+class FakeGeminiModel:
+    """Stands in for genai.GenerativeModel, replaying canned response texts"""
+    
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.prompts = []
+    
+    async def generate_content_async(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(text=self.texts.pop(0))
+
+class TestGeminiGeneration:
+    """Test Gemini output validation and caching"""
+    
+    def setup_method(self):
+        self.cache = LLMCache()
+        self.generator = AIQuestionGenerator(api_key="test-key", provider="gemini", cache=self.cache)
+    
+    @pytest.mark.asyncio
+    async def test_malformed_response_is_reprompted_not_cached(self):
+        """Test invalid output is re-prompted and only the valid retry is cached"""
+        self.generator._gemini_model = FakeGeminiModel(["Sorry, I can't do that.", QUESTION_ARGUMENTS])
+        
+        question = await self.generator._generate_with_gemini(
+            "Plants make food through photosynthesis.", QuestionType.MULTIPLE_CHOICE, "Biology", None
+        )
+        
+        assert question.text == "What do plants use to make food?"
+        assert "Sorry, I can't do that." in self.generator._gemini_model.prompts[1]
+        assert list(self.cache.backend.entries.values()) == [QUESTION_ARGUMENTS]
+    
+    @pytest.mark.asyncio
+    async def test_persistently_malformed_response_not_cached(self):
+        """Test output that never validates returns None and leaves the cache empty"""
+        self.generator._gemini_model = FakeGeminiModel(['{"question": 42}'] * 5)
+        
+        question = await self.generator._generate_with_gemini(
+            "Plants make food through photosynthesis.", QuestionType.MULTIPLE_CHOICE, "Biology", None
+        )
+        
+        assert question is None
+        assert not self.cache.backend.entries
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("difficulty, expected", [
+        ("Advanced", DifficultyLevel.ADVANCED),
+        ("EXPERT", DifficultyLevel.EXPERT),
+        ("medium", DifficultyLevel.INTERMEDIATE)
+    ])
+    async def test_mixed_case_difficulty_accepted(self, difficulty, expected):
+        """Test provider difficulty is normalized by the schema instead of triggering a re-prompt"""
+        response = json.dumps({**json.loads(QUESTION_ARGUMENTS), "difficulty": difficulty})
+        self.generator._gemini_model = FakeGeminiModel([response])
+        
+        question = await self.generator._generate_with_gemini(
+            "Plants make food through photosynthesis.", QuestionType.MULTIPLE_CHOICE, "Biology", None
+        )
+        
+        assert question.difficulty is expected
+        assert len(self.generator._gemini_model.prompts) == 1
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
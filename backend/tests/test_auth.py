@@ -0,0 +1,121 @@
+"""
+Unit tests for authentication helpers
+Tests token decoding and the auth hot-path caches.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import bcrypt
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from backend.routers import auth
+from backend.routers.auth import (
+    authenticate_user, create_access_token, get_current_user, invalidate_user_cache, _decode, _payload_expiry
+)
+
+class TestPayloadCache:
+    """Test cases for the decoded-token payload cache"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        auth._payload_cache.clear()
+        yield
+        auth._payload_cache.clear()
+
+    def test_keyed_by_full_digest(self):
+        """Test cache keys are the full SHA-256 digest, never the raw or a truncated token hash"""
+        token = create_access_token({"sub": "alice"}, expires_delta=timedelta(minutes=5))
+
+        payload = _decode(token)
+
+        assert payload["sub"] == "alice"
+        assert list(auth._payload_cache) == [hashlib.sha256(token.encode()).digest()]
+
+    def test_entry_lifetime_capped_at_exp(self):
+        """Test an entry expires at the token's exp when that comes before the cache TTL"""
+        now = time.time()
+        assert _payload_expiry(b"key", {"exp": now + 5}, now) == now + 5
+        assert _payload_expiry(b"key", {"exp": now + 3600}, now) == now + auth.PAYLOAD_CACHE_TTL_SECONDS
+
+    def test_expired_entry_not_served(self):
+        """Test a payload whose exp has passed is dropped from the cache"""
+        token = create_access_token({"sub": "alice"}, expires_delta=timedelta(minutes=5))
+        key = hashlib.sha256(token.encode()).digest()
+        auth._payload_cache[key] = {"sub": "alice", "exp": time.time() - 1}
+
+        assert key not in auth._payload_cache
+
+class FakeUsersCollection:
+    """Users collection holding documents by username"""
+
+    def __init__(self):
+        self.documents = {}
+
+    async def find_one(self, query, projection=None):
+        document = self.documents.get(query["username"])
+        return dict(document) if document else None
+
+    async def update_one(self, query, update):
+        for document in self.documents.values():
+            if document["_id"] == query["_id"]:
+                document.update(update["$set"])
+
+class TestUserCache:
+    """Test cases for the authenticated-user cache"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        auth._user_cache.clear()
+        self.users = FakeUsersCollection()
+        self.users.documents["alice"] = {
+            "_id": ObjectId(), "username": "alice", "email": "alice@example.com",
+            "hashed_password": bcrypt.hashpw(b"password123", bcrypt.gensalt(rounds=4)).decode(),
+            "created_at": datetime.utcnow(), "is_active": True
+        }
+        self.request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(users_coll=self.users)))
+        token = create_access_token({"sub": "alice"}, expires_delta=timedelta(minutes=5))
+        self.credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        yield
+        auth._user_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_deactivation_takes_effect_after_invalidation(self):
+        """Test a user deactivated in the database is rejected once the write invalidates the cache"""
+        user = await get_current_user(self.credentials, self.request)
+        assert user.username == "alice"
+        assert "alice" in auth._user_cache
+
+        self.users.documents["alice"]["is_active"] = False
+        invalidate_user_cache("alice")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_user(self.credentials, self.request)
+        assert exc_info.value.status_code == 401
+        assert "alice" not in auth._user_cache
+
+    @pytest.mark.asyncio
+    async def test_inactive_cache_hit_rejected(self):
+        """Test is_active is re-checked when the user comes from the cache"""
+        await get_current_user(self.credentials, self.request)
+        auth._user_cache["alice"] = auth._user_cache["alice"].model_copy(update={"is_active": False})
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_user(self.credentials, self.request)
+        assert exc_info.value.detail == "Inactive user"
+
+    @pytest.mark.asyncio
+    async def test_password_rehash_invalidates_cache(self):
+        """Test upgrading a legacy password hash drops the cached user"""
+        await get_current_user(self.credentials, self.request)
+
+        user = await authenticate_user("alice", "password123", self.request)
+
+        assert user is not None
+        assert self.users.documents["alice"]["hashed_password"].startswith("$argon2")
+        assert "alice" not in auth._user_cache
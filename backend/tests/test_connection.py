@@ -0,0 +1,130 @@
+"""
+Unit tests for database index management
+Runs create_indexes against in-memory fake collections.
+"""
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from backend.database import connection
+from backend.database.connection import (
+    Collections, create_indexes, drop_index_if_exists, sync_session_ttl_index
+)
+
+class FakeCollection:
+    """Records index operations the way Motor's collection API exposes them"""
+
+    def __init__(self, name, indexes=None):
+        self.name = name
+        self.indexes = {"_id_": {"key": [("_id", 1)]}, **(indexes or {})}
+
+    async def create_index(self, keys, name=None, background=None, **options):
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        name = name or "_".join(f"{field}_{direction}" for field, direction in keys)
+        self.indexes[name] = {"key": keys, **options}
+        return name
+
+    async def drop_index(self, name):
+        if name not in self.indexes:
+            raise OperationFailure(f"index not found with name [{name}]", code=27)
+        del self.indexes[name]
+
+    async def index_information(self):
+        return dict(self.indexes)
+
+class FakeDatabase:
+    """Hands out one FakeCollection per name"""
+
+    def __init__(self, collections=None):
+        self.collections = collections or {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection(name))
+
+class TestCreateIndexes:
+    """Test cases for create_indexes and its migrations"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        self.database = FakeDatabase()
+        monkeypatch.setattr(connection, "get_database", lambda: self.database)
+
+    @pytest.mark.asyncio
+    async def test_drops_redundant_indexes(self):
+        """Test indexes superseded by the compound indexes are dropped from existing deployments"""
+        legacy = {name: {"key": []} for name in ("subject_1_topic_1_difficulty_1", "tags_1", "created_by_1")}
+        self.database.collections[Collections.QUESTIONS] = FakeCollection(Collections.QUESTIONS, legacy)
+
+        await create_indexes()
+
+        questions = set(self.database[Collections.QUESTIONS].indexes)
+        assert "subject_1_topic_1_difficulty_1" not in questions
+        assert "tags_1" not in questions
+        assert "subject_1_topic_1_difficulty_1_tags_1" in questions
+        assert "created_by_1" in questions  # Still used on its own for questions
+
+        sessions = self.database[Collections.QUIZ_SESSIONS].indexes
+        assert "user_recent" in sessions
+        assert "user_id_1_quiz_id_1" not in sessions
+
+    @pytest.mark.asyncio
+    async def test_users_keep_only_unique_lookups(self):
+        """Test the non-covering login_cov index is removed and not recreated"""
+        legacy = {"login_cov": {"key": [("username", 1), ("hashed_password", 1), ("is_active", 1)]}}
+        self.database.collections[Collections.USERS] = FakeCollection(Collections.USERS, legacy)
+
+        await create_indexes()
+
+        assert set(self.database[Collections.USERS].indexes) == {"_id_", "username_1", "email_1"}
+
+    @pytest.mark.asyncio
+    async def test_session_retention_disabled_by_default(self):
+        """Test no TTL index is kept unless a retention period is configured"""
+        legacy = {"created_at_1": {"key": [("created_at", 1)], "expireAfterSeconds": 30 * 86400}}
+        self.database.collections[Collections.QUIZ_SESSIONS] = FakeCollection(Collections.QUIZ_SESSIONS, legacy)
+
+        await create_indexes()
+
+        assert "created_at_1" not in self.database[Collections.QUIZ_SESSIONS].indexes
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("legacy_options", [{}, {"expireAfterSeconds": 30 * 86400}, None])
+    async def test_session_ttl_index_migrates(self, legacy_options):
+        """Test a plain or differently-timed created_at index is replaced by the configured TTL"""
+        indexes = {} if legacy_options is None else {"created_at_1": {"key": [("created_at", 1)], **legacy_options}}
+        collection = FakeCollection(Collections.QUIZ_SESSIONS, indexes)
+
+        await sync_session_ttl_index(collection, retention_seconds=90 * 86400)
+
+        assert collection.indexes["created_at_1"]["expireAfterSeconds"] == 90 * 86400
+
+    @pytest.mark.asyncio
+    async def test_matching_session_ttl_index_is_kept(self):
+        """Test an index already matching the retention is left alone"""
+        index = {"key": [("created_at", 1)], "expireAfterSeconds": 86400}
+        collection = FakeCollection(Collections.QUIZ_SESSIONS, {"created_at_1": index})
+
+        await sync_session_ttl_index(collection, retention_seconds=86400)
+
+        assert collection.indexes["created_at_1"] is index
+
+    @pytest.mark.asyncio
+    async def test_missing_index_is_not_an_error(self):
+        """Test dropping an index that was never created is a no-op"""
+        collection = FakeCollection("quizzes")
+        assert await drop_index_if_exists(collection, "status_1") is False
+
+        collection.indexes["status_1"] = {"key": [("status", 1)]}
+        assert await drop_index_if_exists(collection, "status_1") is True
+        assert "status_1" not in collection.indexes
+
+    @pytest.mark.asyncio
+    async def test_other_drop_failures_propagate(self):
+        """Test errors other than a missing index are not swallowed"""
+        class Unauthorized(FakeCollection):
+            async def drop_index(self, name):
+                raise OperationFailure("not authorized", code=13)
+
+        with pytest.raises(OperationFailure):
+            await drop_index_if_exists(Unauthorized("quizzes"), "status_1")
@@ -4,13 +4,12 @@ Tests the adaptive difficulty optimization functionality.
 """
 
 import pytest
-import sys
-import os
+import numpy as np
 
-# Add the parent directory to the path so we can import backend modules
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from backend.utils.dynamic_programming import DifficultyOptimizer
+from backend.utils.dynamic_programming import (
+    DifficultyOptimizer, EFFICIENCY_MATRIX, NUM_LEVELS, OPTIMAL_NEXT_DIFFICULTY, OPTIMAL_TRANSITIONS,
+    TRANSITION_COSTS_ARR
+)
 from backend.models.question import DifficultyLevel
 
 class TestDifficultyOptimizer:
@@ -129,6 +128,21 @@ class TestDifficultyOptimizer:
                 DifficultyLevel.EXPERT
             ]
     
+    def test_optimize_quiz_difficulty_sequence_idx(self):
+        """Test the index form of the sequence matches the enum form and feeds analysis"""
+        np.random.seed(0)
+        levels = self.optimizer.optimize_quiz_difficulty_sequence_idx(8, DifficultyLevel.ADVANCED)
+        np.random.seed(0)
+        sequence = self.optimizer.optimize_quiz_difficulty_sequence(8, DifficultyLevel.ADVANCED)
+        
+        assert levels.dtype == np.int8
+        assert levels[0] == self.optimizer.difficulty_map[DifficultyLevel.ADVANCED]
+        assert [self.optimizer.difficulty_map[d] for d in sequence] == levels.tolist()
+        
+        scores = [0.5, 0.7, 0.9, 0.4, 0.6, 0.8, 0.3, 1.0]
+        assert (self.optimizer.analyze_difficulty_progression(levels, scores) ==
+                self.optimizer.analyze_difficulty_progression(sequence, scores))
+    
     def test_analyze_difficulty_progression(self):
         """Test analyzing the effectiveness of a difficulty progression"""
         # Create test sequence and performance
@@ -181,21 +195,23 @@ class TestDifficultyOptimizer:
         assert empty_recommendations['recommended_difficulty'] == DifficultyLevel.INTERMEDIATE
         assert empty_recommendations['confidence'] == 0.5
     
-    def test_memoization(self):
-        """Test that results are cached for repeated calls"""
-        current_difficulty = DifficultyLevel.INTERMEDIATE
-        performance_score = 0.7
-        
-        # Clear cache first
-        self.optimizer.transition_cache.clear()
-        
-        # First call
-        result1 = self.optimizer.get_optimal_next_difficulty(current_difficulty, performance_score)
-        assert len(self.optimizer.transition_cache) > 0
-        
-        # Second call with same parameters should use cache
-        result2 = self.optimizer.get_optimal_next_difficulty(current_difficulty, performance_score)
-        assert result1 == result2
+    def test_lookup_table(self):
+        """Test the precomputed next-difficulty table maximizes efficiency minus transition cost"""
+        for category in range(NUM_LEVELS):
+            for current_level in range(NUM_LEVELS):
+                values = [
+                    EFFICIENCY_MATRIX[category][next_level] - TRANSITION_COSTS_ARR[current_level][next_level]
+                    for next_level in range(NUM_LEVELS)
+                ]
+                assert OPTIMAL_TRANSITIONS[category][current_level] == values.index(max(values))
+        
+        for difficulty, level in self.optimizer.difficulty_map.items():
+            for performance_score, category in ((0.0, 3), (0.39, 3), (0.4, 2), (0.59, 2), (0.6, 1),
+                                                (0.7, 1), (0.79, 1), (0.8, 0), (1.0, 0)):
+                result = self.optimizer.get_optimal_next_difficulty(difficulty, performance_score)
+                assert result is OPTIMAL_NEXT_DIFFICULTY[category][level]
+        
+        assert not hasattr(self.optimizer, 'transition_cache')
     
     def test_edge_cases(self):
         """Test edge cases and boundary conditions"""
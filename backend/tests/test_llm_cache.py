@@ -0,0 +1,57 @@
+"""
+Unit tests for LLM response cache implementation
+Tests cache keys, LRU eviction and hit/miss tracking (no Redis configured).
+"""
+
+import pytest
+
+from backend.services.llm_cache import LLMCache, InMemoryLRUBackend, create_llm_cache
+
+class TestLLMCache:
+    """Test cases for LLMCache class"""
+
+    def setup_method(self):
+        """Set up test fixtures before each test method"""
+        self.cache = LLMCache(InMemoryLRUBackend(max_size=2))
+        self.messages = [{"role": "user", "content": "Generate a question about photosynthesis"}]
+
+    def test_make_key(self):
+        """Test keys are stable and depend on model, messages and temperature"""
+        key = LLMCache.make_key("gpt-3.5-turbo", self.messages, 0.7)
+
+        assert key == LLMCache.make_key("gpt-3.5-turbo", list(self.messages), 0.7)
+        assert key != LLMCache.make_key("gpt-4", self.messages, 0.7)
+        assert key != LLMCache.make_key("gpt-3.5-turbo", self.messages, 0.2)
+        assert len(key) == 64
+
+    @pytest.mark.asyncio
+    async def test_hits_and_misses(self):
+        """Test cached responses are returned and counted"""
+        assert await self.cache.get("k1") is None
+        await self.cache.set("k1", '{"question": "What is photosynthesis?"}')
+
+        assert await self.cache.get("k1") == '{"question": "What is photosynthesis?"}'
+        assert self.cache.stats == {"hits": 1, "misses": 1}
+
+        await self.cache.delete("k1")
+        assert await self.cache.get("k1") is None
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """Test the least recently used entry is evicted past max_size"""
+        await self.cache.set("k1", "a")
+        await self.cache.set("k2", "b")
+        await self.cache.get("k1")  # k2 is now least recently used
+        await self.cache.set("k3", "c")
+
+        assert await self.cache.get("k1") == "a"
+        assert await self.cache.get("k2") is None
+        assert await self.cache.get("k3") == "c"
+
+    def test_create_without_redis(self):
+        """Test factory falls back to the in-memory backend"""
+        cache = create_llm_cache(None)
+        assert isinstance(cache.backend, InMemoryLRUBackend)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -3,65 +3,84 @@ Unit tests for queue manager implementation
 Tests the deque-based question sequencing functionality.
 """
 
-import pytest
-import sys
-import os
+from collections import Counter, deque
 
-# Add the parent directory to the path so we can import backend modules
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
 
 from backend.utils.queue_manager import QuestionQueue
 from backend.models.question import QuestionResponse, DifficultyLevel, QuestionType, QuestionOption
 
+class CountingDeque(deque):
+    """deque that counts calls to its methods, so tests can check how the queue is accessed"""
+    
+    def __init__(self, *args):
+        self.calls = Counter()
+        super().__init__(*args)
+
+def _counted(name):
+    def method(self, *args):
+        self.calls[name] += 1
+        return getattr(deque, name)(self, *args)
+    return method
+
+for _name in ('append', 'appendleft', 'extend', 'extendleft', 'pop', 'popleft', 'insert', 'remove',
+              'rotate', 'clear', 'index', '__iter__', '__getitem__', '__setitem__', '__delitem__'):
+    setattr(CountingDeque, _name, _counted(_name))
+
+@pytest.fixture(scope="module")
+def sample_questions():
+    """Sample questions with different difficulties, validated once per module (the queue never mutates them)"""
+    beginner_question = QuestionResponse(
+        text="What is 2+2?",
+        question_type=QuestionType.MULTIPLE_CHOICE,
+        subject="Mathematics",
+        topic="Basic Math",
+        difficulty=DifficultyLevel.BEGINNER,
+        options=[
+            QuestionOption(text="3", is_correct=False),
+            QuestionOption(text="4", is_correct=True),
+            QuestionOption(text="5", is_correct=False),
+            QuestionOption(text="6", is_correct=False)
+        ]
+    )
+    
+    intermediate_question = QuestionResponse(
+        text="What is the quadratic formula?",
+        question_type=QuestionType.MULTIPLE_CHOICE,
+        subject="Mathematics",
+        topic="Algebra",
+        difficulty=DifficultyLevel.INTERMEDIATE,
+        options=[
+            QuestionOption(text="ax² + bx + c", is_correct=False),
+            QuestionOption(text="(-b ± √(b²-4ac))/2a", is_correct=True),
+            QuestionOption(text="a² + b² = c²", is_correct=False),
+            QuestionOption(text="y = mx + b", is_correct=False)
+        ]
+    )
+    
+    advanced_question = QuestionResponse(
+        text="What is the derivative of ln(x)?",
+        question_type=QuestionType.MULTIPLE_CHOICE,
+        subject="Mathematics",
+        topic="Calculus",
+        difficulty=DifficultyLevel.ADVANCED,
+        options=[
+            QuestionOption(text="1/x", is_correct=True),
+            QuestionOption(text="x", is_correct=False),
+            QuestionOption(text="ln(x)", is_correct=False),
+            QuestionOption(text="e^x", is_correct=False)
+        ]
+    )
+    return beginner_question, intermediate_question, advanced_question
+
 class TestQuestionQueue:
     """Test cases for QuestionQueue class"""
     
-    def setup_method(self):
-        """Set up test fixtures before each test method"""
+    @pytest.fixture(autouse=True)
+    def setup(self, sample_questions):
+        """Set up a fresh queue before each test method"""
         self.queue = QuestionQueue(adaptive_mode=True)
-        
-        # Create sample questions with different difficulties
-        self.beginner_question = QuestionResponse(
-            text="What is 2+2?",
-            question_type=QuestionType.MULTIPLE_CHOICE,
-            subject="Mathematics",
-            topic="Basic Math",
-            difficulty=DifficultyLevel.BEGINNER,
-            options=[
-                QuestionOption(text="3", is_correct=False),
-                QuestionOption(text="4", is_correct=True),
-                QuestionOption(text="5", is_correct=False),
-                QuestionOption(text="6", is_correct=False)
-            ]
-        )
-        
-        self.intermediate_question = QuestionResponse(
-            text="What is the quadratic formula?",
-            question_type=QuestionType.MULTIPLE_CHOICE,
-            subject="Mathematics",
-            topic="Algebra",
-            difficulty=DifficultyLevel.INTERMEDIATE,
-            options=[
-                QuestionOption(text="ax² + bx + c", is_correct=False),
-                QuestionOption(text="(-b ± √(b²-4ac))/2a", is_correct=True),
-                QuestionOption(text="a² + b² = c²", is_correct=False),
-                QuestionOption(text="y = mx + b", is_correct=False)
-            ]
-        )
-        
-        self.advanced_question = QuestionResponse(
-            text="What is the derivative of ln(x)?",
-            question_type=QuestionType.MULTIPLE_CHOICE,
-            subject="Mathematics",
-            topic="Calculus",
-            difficulty=DifficultyLevel.ADVANCED,
-            options=[
-                QuestionOption(text="1/x", is_correct=True),
-                QuestionOption(text="x", is_correct=False),
-                QuestionOption(text="ln(x)", is_correct=False),
-                QuestionOption(text="e^x", is_correct=False)
-            ]
-        )
+        self.beginner_question, self.intermediate_question, self.advanced_question = sample_questions
     
     def test_queue_initialization(self):
         """Test queue initialization"""
@@ -69,6 +88,9 @@ class TestQuestionQueue:
         assert self.queue.adaptive_mode == True
         assert self.queue.stats['total_added'] == 0
         assert self.queue.stats['total_served'] == 0
+        
+        # FIFO pops must stay O(1); a list would make popleft-style access O(n)
+        assert isinstance(self.queue.queue, deque)
     
     def test_add_questions(self):
         """Test adding multiple questions to queue"""
@@ -85,6 +107,23 @@ class TestQuestionQueue:
         assert self.queue.stats['difficulty_distribution']['intermediate'] == 1
         assert self.queue.stats['difficulty_distribution']['advanced'] == 1
     
+    def test_add_questions_bulk_extend(self):
+        """Test bulk loading is a single extend that keeps order and stats"""
+        self.queue.queue = CountingDeque()
+        questions = [self.beginner_question, self.intermediate_question] * 5_000
+        
+        self.queue.add_questions(questions, randomize=False)
+        
+        # One C-level extend; no per-question appends or inserts
+        assert self.queue.queue.calls == Counter({'extend': 1})
+        assert len(self.queue.queue) == 10_000
+        assert self.queue.queue[0] is self.beginner_question
+        assert self.queue.queue[-1] is self.intermediate_question
+        assert self.queue.stats['total_added'] == 10_000
+        assert self.queue.stats['current_size'] == 10_000
+        assert self.queue.stats['difficulty_distribution']['beginner'] == 5_000
+        assert self.queue.stats['difficulty_distribution']['intermediate'] == 5_000
+    
     def test_add_question_priority(self):
         """Test adding questions with priority"""
         self.queue.add_questions([self.intermediate_question], randomize=False)
@@ -99,11 +138,11 @@ class TestQuestionQueue:
         
         # Check order: high priority should be first
         first_question = self.queue.queue[0]
-        assert first_question == self.beginner_question
+        assert first_question is self.beginner_question
         
         # Last should be low priority
         last_question = self.queue.queue[-1]
-        assert last_question == self.advanced_question
+        assert last_question is self.advanced_question
     
     def test_get_next_question(self):
         """Test getting next question from queue"""
@@ -112,31 +151,44 @@ class TestQuestionQueue:
         
         # Get first question
         next_question = self.queue.get_next_question()
-        assert next_question == self.beginner_question
+        assert next_question is self.beginner_question
         assert len(self.queue.queue) == 1
         assert self.queue.stats['total_served'] == 1
         
         # Get second question
         next_question = self.queue.get_next_question()
-        assert next_question == self.intermediate_question
+        assert next_question is self.intermediate_question
         assert len(self.queue.queue) == 0
         
         # Try to get question from empty queue
         next_question = self.queue.get_next_question()
         assert next_question is None
     
+    def test_get_next_question_is_amortized_o1(self):
+        """Test serving from a large queue touches only its head"""
+        self.queue.queue = CountingDeque([self.beginner_question] * 200_000)
+        queue = self.queue.queue
+        
+        for _ in range(10_000):
+            self.queue.get_next_question()
+        
+        # Each serve is one O(1) popleft: no iteration, indexing or rebuilding of the queue
+        assert self.queue.queue is queue
+        assert queue.calls == Counter({'popleft': 10_000})
+        assert len(self.queue.queue) == 190_000
+    
     def test_peek_next_question(self):
         """Test peeking at next question without removing it"""
         self.queue.add_questions([self.beginner_question, self.intermediate_question], randomize=False)
         
         # Peek at next question
         peeked_question = self.queue.peek_next_question()
-        assert peeked_question == self.beginner_question
+        assert peeked_question is self.beginner_question
         assert len(self.queue.queue) == 2  # Should not remove question
         
         # Peek again, should be same question
         peeked_again = self.queue.peek_next_question()
-        assert peeked_again == self.beginner_question
+        assert peeked_again is self.beginner_question
     
     def test_peek_questions(self):
         """Test peeking at multiple questions"""
@@ -146,8 +198,8 @@ class TestQuestionQueue:
         # Peek at first 2 questions
         peeked_questions = self.queue.peek_questions(2)
         assert len(peeked_questions) == 2
-        assert peeked_questions[0] == self.beginner_question
-        assert peeked_questions[1] == self.intermediate_question
+        assert peeked_questions[0] is self.beginner_question
+        assert peeked_questions[1] is self.intermediate_question
         
         # Original queue should be unchanged
         assert len(self.queue.queue) == 3
@@ -162,7 +214,7 @@ class TestQuestionQueue:
         assert self.queue.performance_history[0] == 1.0
         
         answer_record = self.queue.answered_questions[0]
-        assert answer_record['question'] == self.beginner_question
+        assert answer_record['question'] is self.beginner_question
         assert answer_record['is_correct'] == True
         assert answer_record['time_taken'] == 5.0
         assert answer_record['difficulty'] == DifficultyLevel.BEGINNER
@@ -174,6 +226,30 @@ class TestQuestionQueue:
         assert len(self.queue.performance_history) == 2
         assert self.queue.performance_history[1] == 0.0
     
+    def test_performance_history_window(self):
+        """Test only the most recent answers are kept for adaptive adjustments"""
+        for i in range(15):
+            self.queue.record_answer(self.beginner_question, is_correct=i % 2 == 0, time_taken=1.0)
+        
+        assert len(self.queue.performance_history) == 10
+        assert list(self.queue.performance_history) == [1.0 if i % 2 == 0 else 0.0 for i in range(5, 15)]
+        assert len(self.queue.answered_questions) == 15
+    
+    def test_difficulty_recommendations_running_totals(self):
+        """Test recommendations from the running totals match the optimizer on the answer history"""
+        history = []
+        for i in range(25):
+            question = self.beginner_question if i % 3 else self.intermediate_question
+            is_correct = i % 4 != 0
+            self.queue.record_answer(question, is_correct=is_correct, time_taken=1.0)
+            history.append((question.difficulty, 1.0 if is_correct else 0.0))
+            
+            expected = self.queue.difficulty_optimizer.get_difficulty_recommendations(history)
+            assert self.queue.get_difficulty_recommendations() == expected
+        
+        assert len(self.queue.difficulty_history) == 10
+        assert sum(count for _, count in self.queue._difficulty_totals.values()) == 10
+    
     def test_get_queue_status(self):
         """Test getting queue status"""
         questions = [self.beginner_question, self.intermediate_question]
@@ -211,8 +287,8 @@ class TestQuestionQueue:
         questions = [self.beginner_question, self.intermediate_question, self.advanced_question]
         self.queue.add_questions(questions, randomize=False)
         
-        # Get original order
-        original_order = list(self.queue.queue)
+        # Get original identities
+        original_ids = Counter(map(id, self.queue.queue))
         
         # Shuffle (may or may not change order, but should not crash)
         self.queue.shuffle_queue()
@@ -220,20 +296,21 @@ class TestQuestionQueue:
         # Queue size should remain the same
         assert len(self.queue.queue) == 3
         
-        # All original questions should still be present
-        shuffled_questions = list(self.queue.queue)
-        for question in original_order:
-            assert question in shuffled_questions
+        # All original questions should still be present; shuffling never copies them, so
+        # compare identities rather than scanning with field-wise model equality
+        assert Counter(map(id, self.queue.queue)) == original_ids
     
     def test_insert_at_position(self):
         """Test inserting question at specific position"""
         self.queue.add_questions([self.beginner_question, self.advanced_question], randomize=False)
         
+        queue = self.queue.queue
+        
         # Insert intermediate question at position 1
         self.queue.insert_at_position(self.intermediate_question, 1)
         
         assert len(self.queue.queue) == 3
-        assert self.queue.queue[1] == self.intermediate_question
+        assert self.queue.queue[1] is self.intermediate_question
         
         # Test inserting at invalid position (should append to end)
         extra_question = QuestionResponse(
@@ -246,7 +323,53 @@ class TestQuestionQueue:
         )
         
         self.queue.insert_at_position(extra_question, 100)
-        assert self.queue.queue[-1] == extra_question
+        assert self.queue.queue[-1] is extra_question
+        
+        # Negative positions also append, and the deque is updated in place
+        self.queue.insert_at_position(self.advanced_question, -1)
+        assert self.queue.queue[-1] is self.advanced_question
+        assert self.queue.queue is queue
+    
+    def test_reorder_by_difficulty(self):
+        """Test reordering is a stable partition and skips already-partitioned queues"""
+        self.queue.add_questions(
+            [self.beginner_question, self.advanced_question, self.intermediate_question, self.advanced_question],
+            randomize=False
+        )
+        queue = self.queue.queue
+        
+        self.queue._reorder_by_difficulty(DifficultyLevel.ADVANCED)
+        assert self.queue.queue is queue
+        assert [q.difficulty for q in self.queue.queue] == [
+            DifficultyLevel.ADVANCED, DifficultyLevel.ADVANCED,
+            DifficultyLevel.BEGINNER, DifficultyLevel.INTERMEDIATE
+        ]
+        
+        # Already partitioned for the target: order is unchanged
+        before = list(self.queue.queue)
+        self.queue._reorder_by_difficulty(DifficultyLevel.ADVANCED)
+        assert all(a is b for a, b in zip(self.queue.queue, before))
+    
+    def test_adaptive_ordering_skips_repeat_reorders(self, monkeypatch):
+        """Test the queue is repartitioned only when the target changes or questions are added"""
+        self.queue.add_questions([self.beginner_question, self.advanced_question] * 5, randomize=False)
+        for _ in range(3):
+            self.queue.record_answer(self.intermediate_question, is_correct=True, time_taken=1.0)
+        
+        reorders = []
+        original_reorder = self.queue._reorder_by_difficulty
+        monkeypatch.setattr(self.queue, '_reorder_by_difficulty',
+                            lambda target: reorders.append(target) or original_reorder(target))
+        
+        # Same recent performance and current difficulty: one partition serves every pop
+        for _ in range(3):
+            self.queue.get_next_question()
+        assert len(reorders) == 1
+        
+        # New questions may break the partition, so the next pop checks again
+        self.queue.add_question_priority(self.beginner_question, priority="low")
+        self.queue.get_next_question()
+        assert len(reorders) == 2
     
     def test_adaptive_mode_disabled(self):
         """Test queue behavior with adaptive mode disabled"""
@@ -264,9 +387,9 @@ class TestQuestionQueue:
         second = non_adaptive_queue.get_next_question()
         third = non_adaptive_queue.get_next_question()
         
-        assert first == self.beginner_question
-        assert second == self.intermediate_question  
-        assert third == self.advanced_question
+        assert first is self.beginner_question
+        assert second is self.intermediate_question
+        assert third is self.advanced_question
 
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Unit tests for quiz router helpers
+Tests the per-key AI generator cache.
+"""
+
+import hashlib
+
+import pytest
+
+from backend.routers import quiz
+from backend.routers.quiz import _ai_service, close_ai_services
+
+class TestAIServiceCache:
+    """Test cases for the leased AIQuestionGenerator cache"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(quiz, "AI_SERVICE_CACHE_SIZE", 2)
+        monkeypatch.setattr(quiz, "_ai_services", type(quiz._ai_services)())
+        monkeypatch.setattr(quiz, "_ai_service_leases", type(quiz._ai_service_leases)())
+
+    @staticmethod
+    def _open_client(service):
+        """Create the generator's pooled client, returning it for later checks"""
+        return service._get_openai_client()
+
+    @pytest.mark.asyncio
+    async def test_reuses_generator_keyed_by_digest(self):
+        """Test one generator per key, with only a digest of the key in the cache"""
+        async with _ai_service("sk-secret", "openai") as first:
+            pass
+        async with _ai_service("sk-secret", "openai") as second:
+            pass
+
+        assert first is second
+        digest = hashlib.sha256(b"sk-secret").hexdigest()
+        assert list(quiz._ai_services) == [(digest, "openai")]
+        assert all("sk-secret" not in str(key) for key in quiz._ai_services)
+
+    @pytest.mark.asyncio
+    async def test_eviction_closes_idle_generator(self):
+        """Test the least recently used generator's client is closed when it is evicted"""
+        async with _ai_service("key-1", "openai") as oldest:
+            client = self._open_client(oldest)
+        async with _ai_service("key-2", "openai"):
+            pass
+        assert not client.is_closed()
+
+        async with _ai_service("key-3", "openai"):
+            pass
+
+        assert client.is_closed()
+        assert oldest not in quiz._ai_services.values()
+
+    @pytest.mark.asyncio
+    async def test_eviction_waits_for_in_flight_use(self):
+        """Test a generator evicted while leased is closed only when its request finishes"""
+        async with _ai_service("key-1", "openai") as in_use:
+            client = self._open_client(in_use)
+            async with _ai_service("key-2", "openai"):
+                pass
+            async with _ai_service("key-3", "openai"):
+                pass
+            assert in_use not in quiz._ai_services.values()
+            assert not client.is_closed()
+
+        assert client.is_closed()
+        assert not quiz._ai_service_leases
+
+    @pytest.mark.asyncio
+    async def test_close_ai_services_on_shutdown(self):
+        """Test shutdown closes every cached generator's client"""
+        clients = []
+        for key in ("key-1", "key-2"):
+            async with _ai_service(key, "openai") as service:
+                clients.append(self._open_client(service))
+
+        await close_ai_services()
+
+        assert all(client.is_closed() for client in clients)
+        assert not quiz._ai_services
@@ -0,0 +1,48 @@
+"""
+Unit tests for semantic cache implementation
+Tests cosine-similarity lookups, bucket isolation and eviction.
+"""
+
+import pytest
+
+from backend.services.semantic_cache import SemanticCache
+
+class TestSemanticCache:
+    """Test cases for SemanticCache class"""
+
+    def setup_method(self):
+        """Set up test fixtures before each test method"""
+        self.cache = SemanticCache(threshold=0.92, max_entries=2)
+        self.cache.set("multiple_choice:", [1.0, 0.0, 0.0], "photosynthesis")
+
+    def test_similar_embedding_hits(self):
+        """Test near-duplicate embeddings return the cached response"""
+        assert self.cache.get("multiple_choice:", [0.98, 0.05, 0.0]) == "photosynthesis"
+        assert self.cache.stats == {"hits": 1, "misses": 0}
+
+    def test_dissimilar_embedding_misses(self):
+        """Test embeddings below the threshold miss"""
+        assert self.cache.get("multiple_choice:", [0.5, 0.5, 0.0]) is None
+        assert self.cache.stats["misses"] == 1
+
+    def test_buckets_are_isolated(self):
+        """Test entries only match within their own bucket"""
+        assert self.cache.get("true_false:", [1.0, 0.0, 0.0]) is None
+
+    def test_best_match_and_eviction(self):
+        """Test the closest entry wins and the oldest is evicted past max_entries"""
+        self.cache.set("multiple_choice:", [0.0, 1.0, 0.0], "cell structure")
+        assert self.cache.get("multiple_choice:", [0.1, 0.99, 0.0]) == "cell structure"
+
+        self.cache.set("multiple_choice:", [0.0, 0.0, 1.0], "genetics")
+        assert len(self.cache.responses["multiple_choice:"]) == 2
+        assert self.cache.get("multiple_choice:", [1.0, 0.0, 0.0]) is None
+
+    def test_zero_embedding_ignored(self):
+        """Test zero vectors are neither stored nor matched"""
+        self.cache.set("true_false:", [0.0, 0.0, 0.0], "nothing")
+        assert "true_false:" not in self.cache.embeddings
+        assert self.cache.get("multiple_choice:", [0.0, 0.0, 0.0]) is None
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,220 @@
+"""
+Unit tests for session store implementation
+Tests in-memory session and question storage, and atomic session updates against a fake Redis.
+"""
+
+import asyncio
+
+import pytest
+
+from backend.utils import session_store
+from backend.utils.session_store import SessionStore
+from backend.utils.queue_manager import QuestionQueue
+from backend.models.question import QuestionResponse, DifficultyLevel, QuestionType, QuestionOption
+
+class FakeWatchError(Exception):
+    """Stands in for redis.exceptions.WatchError when redis isn't installed"""
+
+class FakePipeline:
+    """Optimistic WATCH/MULTI/EXEC over FakeRedis, failing EXEC if a watched key changed"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.watched = {}
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.watched.clear()
+
+    async def watch(self, key):
+        self.watched[key] = self.redis.versions.get(key, 0)
+
+    async def get(self, key):
+        return await self.redis.get(key)
+
+    def multi(self):
+        self.commands = []
+
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value))
+
+    async def execute(self):
+        commands, watched = self.commands, self.watched
+        self.commands, self.watched = [], {}
+        if any(self.redis.versions.get(key, 0) != version for key, version in watched.items()):
+            raise session_store.WatchError("Watched variable changed")
+        for key, value in commands:
+            await self.redis.set(key, value)
+
+class FakeRedis:
+    """Minimal async Redis keeping a version per key so transactions can detect writes"""
+
+    def __init__(self):
+        self.data = {}
+        self.versions = {}
+
+    async def get(self, key):
+        value = self.data.get(key)
+        await asyncio.sleep(0)  # Let other updates interleave between the read and the write
+        return value
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    async def delete(self, key):
+        return int(self.data.pop(key, None) is not None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+class TestSessionStore:
+    """Test cases for SessionStore class"""
+
+    def setup_method(self):
+        """Set up test fixtures before each test method"""
+        self.store = SessionStore(redis_url=None)
+
+        self.question = QuestionResponse(
+            text="Is the sky blue on a clear day?",
+            question_type=QuestionType.TRUE_FALSE,
+            subject="Science",
+            topic="Atmosphere",
+            difficulty=DifficultyLevel.BEGINNER,
+            correct_answer="true"
+        )
+
+    def test_store_initialization(self):
+        """Test store falls back to in-memory storage without a Redis URL"""
+        assert self.store.redis is None
+        assert len(self.store.sessions) == 0
+        assert len(self.store.question_index) == 0
+
+    @pytest.mark.asyncio
+    async def test_session_lifecycle(self):
+        """Test saving, loading and deleting a session"""
+        queue = QuestionQueue(adaptive_mode=False)
+        queue.add_questions([self.question], randomize=False)
+
+        await self.store.save_session("quiz-1", queue)
+        loaded = await self.store.get_session("quiz-1")
+        assert loaded is queue
+
+        assert await self.store.delete_session("quiz-1") == True
+        assert await self.store.get_session("quiz-1") is None
+        assert await self.store.delete_session("quiz-1") == False
+
+    @pytest.mark.asyncio
+    async def test_question_lookup(self):
+        """Test looking up questions by id"""
+        await self.store.add_questions([self.question])
+
+        found = await self.store.get_question(str(self.question.id))
+        assert found is self.question
+
+        missing = await self.store.get_question("non-existent-id")
+        assert missing is None
+
+    @pytest.mark.asyncio
+    async def test_correct_option_text(self):
+        """Test correct option text is precomputed for indexed questions"""
+        mc_question = QuestionResponse(
+            text="What is 2+2?",
+            question_type=QuestionType.MULTIPLE_CHOICE,
+            subject="Mathematics",
+            topic="Basic Math",
+            difficulty=DifficultyLevel.BEGINNER,
+            options=[
+                QuestionOption(text="3", is_correct=False),
+                QuestionOption(text="4", is_correct=True)
+            ]
+        )
+        await self.store.add_questions([mc_question, self.question])
+
+        assert self.store.correct_option_text[str(mc_question.id)] == "4"
+        assert self.store.get_correct_option_text(mc_question) == "4"
+        assert self.store.get_correct_option_text(self.question) is None
+
+    @pytest.mark.asyncio
+    async def test_in_memory_update_session(self):
+        """Test update_session applies the update in place and reports missing sessions"""
+        queue = QuestionQueue(adaptive_mode=False)
+        queue.add_questions([self.question], randomize=False)
+        await self.store.save_session("quiz-1", queue)
+
+        updated, served = await self.store.update_session("quiz-1", lambda q: q.get_next_question())
+
+        assert updated is queue
+        assert served is self.question
+        assert await self.store.update_session("missing", lambda q: q.get_next_question()) == (None, None)
+
+class TestRedisSessionStore:
+    """Test cases for SessionStore sessions stored in (fake) Redis"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        if not hasattr(session_store, "WatchError"):
+            monkeypatch.setattr(session_store, "WatchError", FakeWatchError, raising=False)
+        self.store = SessionStore(redis_url=None)
+        self.store.redis = FakeRedis()
+
+        self.questions = [
+            QuestionResponse(
+                text=f"Question {i}?",
+                question_type=QuestionType.MULTIPLE_CHOICE,
+                subject="Mathematics",
+                topic="Basic Math",
+                difficulty=difficulty,
+                options=[QuestionOption(text="a", is_correct=True), QuestionOption(text="b", is_correct=False)]
+            )
+            for i, difficulty in enumerate([DifficultyLevel.BEGINNER, DifficultyLevel.INTERMEDIATE, DifficultyLevel.ADVANCED])
+        ]
+
+    @pytest.mark.asyncio
+    async def test_sessions_stored_as_json(self):
+        """Test sessions round-trip through JSON, never pickle"""
+        queue = QuestionQueue(adaptive_mode=True)
+        queue.add_questions(self.questions, randomize=False)
+        served = queue.get_next_question()
+        queue.record_answer(served, True, 4.5)
+
+        await self.store.save_session("quiz-1", queue)
+        raw = self.store.redis.data["session:quiz-1"]
+        loaded = await self.store.get_session("quiz-1")
+
+        assert raw.startswith(b"{")
+        assert [q.id for q in loaded.queue] == [q.id for q in queue.queue]
+        assert loaded.answered_questions[0]["question"] == served
+        assert loaded.answered_questions[0]["time_taken"] == 4.5
+        assert list(loaded.performance_history) == [1.0]
+        assert list(loaded.difficulty_history) == list(queue.difficulty_history)
+        assert loaded._difficulty_totals == queue._difficulty_totals
+        assert loaded.stats == queue.stats
+
+    @pytest.mark.asyncio
+    async def test_concurrent_updates_are_not_lost(self):
+        """Test concurrent answer submissions for one session all persist"""
+        queue = QuestionQueue(adaptive_mode=False)
+        queue.add_questions(self.questions, randomize=False)
+        await self.store.save_session("quiz-1", queue)
+
+        await asyncio.gather(*(
+            self.store.update_session("quiz-1", lambda q, question=question: q.record_answer(question, True, 1.0))
+            for question in self.questions
+        ))
+
+        loaded = await self.store.get_session("quiz-1")
+        assert sorted(str(r["question"].id) for r in loaded.answered_questions) == \
+            sorted(str(q.id) for q in self.questions)
+        assert list(loaded.performance_history) == [1.0, 1.0, 1.0]
+
+    @pytest.mark.asyncio
+    async def test_update_missing_session(self):
+        """Test updating a session that doesn't exist returns (None, None)"""
+        assert await self.store.update_session("missing", lambda q: q.get_next_question()) == (None, None)
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -3,15 +3,13 @@ Unit tests for tree structure implementation
 Tests the hierarchical question organization functionality.
 """
 
-import pytest
-import sys
-import os
+from itertools import product
 
-# Add the parent directory to the path so we can import backend modules
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
 
 from backend.utils.tree_structure import QuestionTree, QuestionNode
 from backend.models.question import QuestionResponse, DifficultyLevel, QuestionType, QuestionOption
+from backend.models._types import PyObjectId
 
 class TestQuestionNode:
     """Test cases for QuestionNode class"""
@@ -60,43 +58,90 @@ class TestQuestionNode:
         
         all_questions = parent.get_all_questions()
         assert len(all_questions) == 1
-        assert all_questions[0] == question
+        assert all_questions[0] is question
+    
+    def test_iter_all_questions_order(self):
+        """Test the iterative walk yields a node's questions before its children's, children in insertion order"""
+        root = QuestionNode("root", "root")
+        first, second = QuestionNode("A", "subject"), QuestionNode("B", "subject")
+        grandchild = QuestionNode("A1", "topic")
+        root.questions.append("root")
+        first.questions.append("A")
+        second.questions.append("B")
+        grandchild.questions.append("A1")
+        first.add_child("A1", grandchild)
+        root.add_child("A", first)
+        root.add_child("B", second)
+        
+        walk = root.iter_all_questions()
+        assert next(walk) == "root"
+        assert list(walk) == ["A", "A1", "B"]
+
+@pytest.fixture(scope="module")
+def sample_questions():
+    """Sample questions, validated once per module (the tree never mutates them)"""
+    math_question = QuestionResponse(
+        text="What is 2+2?",
+        question_type=QuestionType.MULTIPLE_CHOICE,
+        subject="Mathematics",
+        topic="Basic Math",
+        difficulty=DifficultyLevel.BEGINNER,
+        options=[
+            QuestionOption(text="3", is_correct=False),
+            QuestionOption(text="4", is_correct=True),
+            QuestionOption(text="5", is_correct=False),
+            QuestionOption(text="6", is_correct=False)
+        ]
+    )
+    
+    physics_question = QuestionResponse(
+        text="What is the speed of light?",
+        question_type=QuestionType.MULTIPLE_CHOICE,
+        subject="Physics",
+        topic="Constants",
+        difficulty=DifficultyLevel.INTERMEDIATE,
+        options=[
+            QuestionOption(text="300,000 km/s", is_correct=True),
+            QuestionOption(text="150,000 km/s", is_correct=False),
+            QuestionOption(text="450,000 km/s", is_correct=False),
+            QuestionOption(text="600,000 km/s", is_correct=False)
+        ]
+    )
+    return math_question, physics_question
+
+@pytest.fixture(scope="module")
+def populated_tree(sample_questions):
+    """Tree holding the sample questions plus an advanced math question, shared by read-only tests"""
+    math_question, physics_question = sample_questions
+    advanced_math_question = QuestionResponse(
+        text="What is the derivative of x^2?",
+        question_type=QuestionType.MULTIPLE_CHOICE,
+        subject="Mathematics",
+        topic="Calculus",
+        difficulty=DifficultyLevel.ADVANCED,
+        options=[
+            QuestionOption(text="2x", is_correct=True),
+            QuestionOption(text="x", is_correct=False),
+            QuestionOption(text="x^2", is_correct=False),
+            QuestionOption(text="2", is_correct=False)
+        ]
+    )
+    
+    tree = QuestionTree()
+    for question in (math_question, physics_question, advanced_math_question):
+        tree.add_question(question)
+    
+    questions = {"math": math_question, "physics": physics_question, "advanced_math": advanced_math_question}
+    return tree, questions
 
 class TestQuestionTree:
     """Test cases for QuestionTree class"""
     
-    def setup_method(self):
-        """Set up test fixtures before each test method"""
+    @pytest.fixture(autouse=True)
+    def setup(self, sample_questions):
+        """Set up a fresh tree before each test method"""
         self.tree = QuestionTree()
-        
-        # Create sample questions
-        self.math_question = QuestionResponse(
-            text="What is 2+2?",
-            question_type=QuestionType.MULTIPLE_CHOICE,
-            subject="Mathematics",
-            topic="Basic Math",
-            difficulty=DifficultyLevel.BEGINNER,
-            options=[
-                QuestionOption(text="3", is_correct=False),
-                QuestionOption(text="4", is_correct=True),
-                QuestionOption(text="5", is_correct=False),
-                QuestionOption(text="6", is_correct=False)
-            ]
-        )
-        
-        self.physics_question = QuestionResponse(
-            text="What is the speed of light?",
-            question_type=QuestionType.MULTIPLE_CHOICE,
-            subject="Physics",
-            topic="Constants",
-            difficulty=DifficultyLevel.INTERMEDIATE,
-            options=[
-                QuestionOption(text="300,000 km/s", is_correct=True),
-                QuestionOption(text="150,000 km/s", is_correct=False),
-                QuestionOption(text="450,000 km/s", is_correct=False),
-                QuestionOption(text="600,000 km/s", is_correct=False)
-            ]
-        )
+        self.math_question, self.physics_question = sample_questions
     
     def test_tree_initialization(self):
         """Test tree initialization"""
@@ -121,73 +166,64 @@ class TestQuestionTree:
         beginner_difficulty = basic_math_topic.get_child("beginner")
         assert beginner_difficulty is not None
         assert len(beginner_difficulty.questions) == 1
-        assert beginner_difficulty.questions[0] == self.math_question
+        assert beginner_difficulty.questions[0] is self.math_question
     
-    def test_get_questions_by_subject(self):
-        """Test retrieving questions by subject"""
-        self.tree.add_question(self.math_question)
-        self.tree.add_question(self.physics_question)
+    def test_add_questions_bulk(self):
+        """Test adding several questions in one call"""
+        self.tree.add_questions_bulk([self.math_question, self.physics_question])
         
-        math_questions = self.tree.get_questions_by_criteria(subject="Mathematics")
-        assert len(math_questions) == 1
-        assert math_questions[0] == self.math_question
+        assert self.tree.total_questions == 2
         
-        physics_questions = self.tree.get_questions_by_criteria(subject="Physics")
-        assert len(physics_questions) == 1
-        assert physics_questions[0] == self.physics_question
-    
-    def test_get_questions_by_difficulty(self):
-        """Test retrieving questions by difficulty"""
-        self.tree.add_question(self.math_question)
-        self.tree.add_question(self.physics_question)
+        beginner_difficulty = self.tree.root.get_child("Mathematics").get_child("Basic Math").get_child("beginner")
+        assert beginner_difficulty.questions == [self.math_question]
         
-        beginner_questions = self.tree.get_questions_by_criteria(
-            difficulty=DifficultyLevel.BEGINNER
-        )
-        assert len(beginner_questions) == 1
-        assert beginner_questions[0] == self.math_question
-        
-        intermediate_questions = self.tree.get_questions_by_criteria(
-            difficulty=DifficultyLevel.INTERMEDIATE
-        )
-        assert len(intermediate_questions) == 1
-        assert intermediate_questions[0] == self.physics_question
+        intermediate_difficulty = self.tree.root.get_child("Physics").get_child("Constants").get_child("intermediate")
+        assert intermediate_difficulty.questions == [self.physics_question]
     
-    def test_get_questions_by_multiple_criteria(self):
-        """Test retrieving questions with multiple criteria"""
-        self.tree.add_question(self.math_question)
-        self.tree.add_question(self.physics_question)
+    @pytest.mark.parametrize("criteria, expected", [
+        ({"subject": "Mathematics"}, ["math", "advanced_math"]),
+        ({"subject": "Physics"}, ["physics"]),
+        ({"difficulty": DifficultyLevel.BEGINNER}, ["math"]),
+        ({"difficulty": DifficultyLevel.INTERMEDIATE}, ["physics"]),
+        ({"subject": "Mathematics", "difficulty": DifficultyLevel.BEGINNER}, ["math"]),
+        ({"subject": "Mathematics", "difficulty": DifficultyLevel.ADVANCED}, ["advanced_math"]),
+        ({"subject": "Chemistry"}, []),
+    ])
+    def test_get_questions_by_criteria(self, populated_tree, criteria, expected):
+        """Test retrieving questions by subject, difficulty and combined criteria"""
+        tree, questions = populated_tree
         
-        # Add another math question with different difficulty
-        advanced_math_question = QuestionResponse(
-            text="What is the derivative of x^2?",
-            question_type=QuestionType.MULTIPLE_CHOICE,
-            subject="Mathematics",
-            topic="Calculus",
-            difficulty=DifficultyLevel.ADVANCED,
-            options=[
-                QuestionOption(text="2x", is_correct=True),
-                QuestionOption(text="x", is_correct=False),
-                QuestionOption(text="x^2", is_correct=False),
-                QuestionOption(text="2", is_correct=False)
-            ]
-        )
-        self.tree.add_question(advanced_math_question)
+        found = tree.get_questions_by_criteria(**criteria)
+        assert [q.id for q in found] == [questions[name].id for name in expected]
+    
+    def test_difficulty_index_keeps_tree_order(self):
+        """Test indexed difficulty queries return questions in tree order, not insertion order"""
+        prototype = self.math_question
+        paths = [("Physics", "Optics"), ("Mathematics", "Algebra"), ("Physics", "Mechanics"),
+                 ("Mathematics", "Geometry"), ("Physics", "Optics")]
+        # Create the topics first at another difficulty so their order differs from the
+        # order their beginner nodes are created in
+        for subject, topic in reversed(paths):
+            self.tree.add_question(prototype.model_copy(update={
+                "subject": subject, "topic": topic, "difficulty": DifficultyLevel.EXPERT, "id": PyObjectId()
+            }))
+        added = []
+        for subject, topic in paths:
+            question = prototype.model_copy(update={"subject": subject, "topic": topic, "id": PyObjectId()})
+            self.tree.add_question(question)
+            added.append(question)
         
-        # Test multiple criteria
-        math_beginner_questions = self.tree.get_questions_by_criteria(
-            subject="Mathematics",
-            difficulty=DifficultyLevel.BEGINNER
-        )
-        assert len(math_beginner_questions) == 1
-        assert math_beginner_questions[0] == self.math_question
+        walked = [
+            q for subject_node in self.tree.root.children.values()
+            for topic_node in subject_node.children.values()
+            for q in topic_node.children.get("beginner", QuestionNode(None, "difficulty")).questions
+        ]
+        found = self.tree.get_questions_by_criteria(difficulty=DifficultyLevel.BEGINNER)
+        assert [q.id for q in found] == [q.id for q in walked]
+        assert sorted(q.id for q in found) == sorted(q.id for q in added)
         
-        math_advanced_questions = self.tree.get_questions_by_criteria(
-            subject="Mathematics",
-            difficulty=DifficultyLevel.ADVANCED
-        )
-        assert len(math_advanced_questions) == 1
-        assert math_advanced_questions[0] == advanced_math_question
+        physics = self.tree.get_questions_by_criteria(subject="Physics", difficulty=DifficultyLevel.BEGINNER, limit=2)
+        assert [q.id for q in physics] == [q.id for q in walked if q.subject == "Physics"][:2]
     
     def test_get_tree_structure(self):
         """Test getting tree structure representation"""
@@ -201,6 +237,19 @@ class TestQuestionTree:
         assert 'Mathematics' in structure['children']
         assert 'Physics' in structure['children']
     
+    def test_tree_structure_cache(self):
+        """Test tree structure is cached until the tree changes"""
+        self.tree.add_question(self.math_question)
+        
+        structure = self.tree.get_tree_structure()
+        assert self.tree.get_tree_structure() is structure
+        
+        # Adding a question invalidates the cached structure
+        self.tree.add_question(self.physics_question)
+        updated_structure = self.tree.get_tree_structure()
+        assert updated_structure is not structure
+        assert 'Physics' in updated_structure['children']
+    
     def test_get_statistics(self):
         """Test getting tree statistics"""
         self.tree.add_question(self.math_question)
@@ -233,18 +282,66 @@ class TestQuestionTree:
         removed = self.tree.remove_question("non-existent-id")
         assert removed == False
     
+    def test_statistics_follow_add_and_remove(self):
+        """Test the incremental counters behind get_statistics track adds and removals"""
+        advanced_math = self.math_question.model_copy(update={
+            "difficulty": DifficultyLevel.ADVANCED, "id": PyObjectId()
+        })
+        self.tree.add_questions_bulk([self.math_question, advanced_math])
+        self.tree.add_question(self.physics_question)
+        
+        math_stats = self.tree.get_statistics()['subjects_detail']['Mathematics']
+        assert math_stats['total_questions'] == 2
+        assert math_stats['difficulty_distribution'] == {"beginner": 1, "advanced": 1}
+        assert math_stats['topics_detail']['Basic Math']['question_count'] == 2
+        
+        assert self.tree.remove_question(str(self.math_question.id))
+        
+        math_stats = self.tree.get_statistics()['subjects_detail']['Mathematics']
+        assert math_stats['total_questions'] == 1
+        assert math_stats['difficulty_distribution'] == {"advanced": 1}
+        assert math_stats['topics_detail']['Basic Math']['question_count'] == 1
+        assert self.tree.root.get_child("Physics").metadata['total_questions'] == 1
+    
+    def test_difficulty_index_stays_sorted_and_deduplicated(self):
+        """Test the insort-maintained difficulty index holds each difficulty node once, in tree order"""
+        prototype = self.math_question
+        subjects, topics = ["Physics", "Mathematics", "Chemistry"], ["Optics", "Algebra", "Kinetics"]
+        difficulties = [DifficultyLevel.EXPERT, DifficultyLevel.BEGINNER, DifficultyLevel.ADVANCED]
+        # Paths in a scrambled order and each added repeatedly, so nodes are created out of
+        # rank order and most inserts hit existing nodes
+        paths = list(product(subjects, topics, difficulties))
+        paths = paths[1::2] + paths[::2]
+        for _ in range(5):
+            for subject, topic, difficulty in paths:
+                self.tree.add_question(prototype.model_copy(update={
+                    "subject": subject, "topic": topic, "difficulty": difficulty, "id": PyObjectId()
+                }))
+        
+        subject_nodes = list(self.tree.root.children.values())
+        for difficulty in difficulties:
+            expected = [
+                topic_node.children[difficulty.value]
+                for subject_node in subject_nodes for topic_node in subject_node.children.values()
+            ]
+            entries = self.tree._by_difficulty[difficulty.value]
+            assert [rank for rank, _ in entries] == sorted(rank for rank, _ in entries)
+            assert [node for _, node in entries] == expected
+            
+            for subject_node in subject_nodes:
+                subject_entries = self.tree._by_subject_difficulty[(subject_node.value, difficulty.value)]
+                assert [node for _, node in subject_entries] == [
+                    topic_node.children[difficulty.value] for topic_node in subject_node.children.values()
+                ]
+        
+        # Index size tracks difficulty nodes, not questions
+        assert sum(len(entries) for entries in self.tree._by_difficulty.values()) == len(paths)
+        assert self.tree.total_questions == 5 * len(paths)
+    
     def test_limit_questions(self):
         """Test limiting number of returned questions"""
-        # Add multiple questions
-        for i in range(5):
-            question = QuestionResponse(
-                text=f"Question {i}",
-                question_type=QuestionType.TRUE_FALSE,
-                subject="TestSubject",
-                topic="TestTopic",
-                difficulty=DifficultyLevel.BEGINNER,
-                correct_answer="true"
-            )
+        # Add multiple questions, copied from one validated prototype
+        for question in self._copies_of_prototype(5):
             self.tree.add_question(question)
         
         # Test limit
@@ -253,6 +350,43 @@ class TestQuestionTree:
         
         all_questions = self.tree.get_questions_by_criteria()
         assert len(all_questions) == 5
+    
+    def test_limit_questions_large(self):
+        """Test the limit keeps the first questions in insertion order on a large tree"""
+        questions = self._copies_of_prototype(500)
+        self.tree.add_questions_bulk(questions)
+        
+        limited_questions = self.tree.get_questions_by_criteria(subject="TestSubject", limit=3)
+        assert [q.id for q in limited_questions] == [q.id for q in questions[:3]]
+        assert len(self.tree.get_questions_by_criteria()) == 500
+    
+    def test_limit_stops_traversal_early(self):
+        """Test a satisfied limit never walks the remaining nodes"""
+        self.tree.add_question(self.math_question)
+        self.tree.add_question(self.physics_question)
+        
+        def fail():
+            raise AssertionError("traversed past the limit")
+        self.tree.root.get_child("Physics").iter_all_questions = fail
+        
+        limited_questions = self.tree.get_questions_by_criteria(limit=1)
+        assert [q.id for q in limited_questions] == [self.math_question.id]
+    
+    @staticmethod
+    def _copies_of_prototype(count):
+        """Distinct questions via model_copy, which skips revalidating the prototype"""
+        prototype = QuestionResponse(
+            text="Question prototype",
+            question_type=QuestionType.TRUE_FALSE,
+            subject="TestSubject",
+            topic="TestTopic",
+            difficulty=DifficultyLevel.BEGINNER,
+            correct_answer="true"
+        )
+        return [
+            prototype.model_copy(update={"text": f"Question {i}", "id": PyObjectId()})
+            for i in range(count)
+        ]
 
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -3,10 +3,101 @@ Dynamic Programming Module - Adaptive Difficulty Optimization
 Uses DP algorithms to optimize question difficulty progression based on user performance.
 """
 
-from typing import Dict, List, Tuple, Optional
+from types import MappingProxyType
+from typing import Dict, List, Tuple, Optional, Sequence, Union
 from backend.models.question import DifficultyLevel
 import numpy as np
 
+NUM_LEVELS = 4
+
+
+def _performance_category(performance_score: float) -> int:
+    """Map a 0.0-1.0 score to an efficiency matrix row (0 = high ... 3 = poor)"""
+    if performance_score >= 0.8:
+        return 0
+    if performance_score >= 0.6:
+        return 1
+    if performance_score >= 0.4:
+        return 2
+    return 3
+
+
+# Lower edges of the average, good and high categories (category = 3 - bucket)
+PERFORMANCE_BINS = np.array([0.4, 0.6, 0.8])
+
+
+def _performance_categories(scores: np.ndarray) -> np.ndarray:
+    """Vectorized _performance_category for an array of scores"""
+    return 3 - np.digitize(scores, PERFORMANCE_BINS)
+
+
+def _trend_factor(performance_history: Sequence[float]) -> float:
+    """Slope of the last three scores, shifted around 1.0 and clamped to [0.5, 1.5]"""
+    if len(performance_history) < 3:
+        return 1.0
+    trend = (performance_history[-1] - performance_history[-3]) / 2
+    return max(0.5, min(1.5, 1.0 + trend))
+
+
+def _optimal_transition_table(efficiency_matrix: np.ndarray, transition_costs_arr: np.ndarray) -> np.ndarray:
+    """
+    Best next level for every (performance category, current level) pair
+    values[p, c, n] = efficiency[p, n] - cost[c, n]; argmax keeps the first level on ties
+    """
+    values = efficiency_matrix[:, np.newaxis, :] - transition_costs_arr[np.newaxis, :, :]
+    return values.argmax(axis=2)
+
+
+# Difficulty levels mapping for DP calculations
+DIFFICULTY_MAP = MappingProxyType({
+    DifficultyLevel.BEGINNER: 0,
+    DifficultyLevel.INTERMEDIATE: 1,
+    DifficultyLevel.ADVANCED: 2,
+    DifficultyLevel.EXPERT: 3
+})
+
+REVERSE_DIFFICULTY_MAP = MappingProxyType({v: k for k, v in DIFFICULTY_MAP.items()})
+
+# Learning efficiency matrix (performance_rate, difficulty_level)
+# Higher values indicate better learning outcomes
+EFFICIENCY_MATRIX = np.array([
+    # Beginner, Intermediate, Advanced, Expert
+    [0.9, 0.7, 0.3, 0.1],  # High performance (>80% correct)
+    [0.8, 0.9, 0.6, 0.3],  # Good performance (60-80% correct)
+    [0.6, 0.8, 0.8, 0.5],  # Average performance (40-60% correct)
+    [0.4, 0.6, 0.7, 0.6],  # Poor performance (<40% correct)
+])
+EFFICIENCY_MATRIX.setflags(write=False)
+
+# Transition costs for difficulty changes
+TRANSITION_COSTS = MappingProxyType({
+    0: 0,   # Stay same difficulty
+    1: 0.1, # Move up one level
+    -1: 0.05, # Move down one level
+    2: 0.3,   # Move up two levels
+    -2: 0.2,  # Move down two levels
+    3: 0.5,   # Move up three levels
+    -3: 0.4   # Move down three levels
+})
+
+# Dense costs[current][next], from which every optimal transition is solved once
+TRANSITION_COSTS_ARR = np.ascontiguousarray([
+    [TRANSITION_COSTS.get(next_level - current_level, 0.5) for next_level in range(NUM_LEVELS)]
+    for current_level in range(NUM_LEVELS)
+], dtype=np.float64)
+TRANSITION_COSTS_ARR.setflags(write=False)
+
+# OPTIMAL_TRANSITIONS[perf_category][current_level] -> next level, as plain ints
+OPTIMAL_TRANSITIONS = tuple(
+    tuple(row) for row in _optimal_transition_table(EFFICIENCY_MATRIX, TRANSITION_COSTS_ARR).tolist()
+)
+
+# Same table mapped back to DifficultyLevels, so lookups skip the reverse mapping
+OPTIMAL_NEXT_DIFFICULTY = tuple(
+    tuple(REVERSE_DIFFICULTY_MAP[level] for level in row) for row in OPTIMAL_TRANSITIONS
+)
+
+
 class DifficultyOptimizer:
     """
     Dynamic Programming-based difficulty optimizer
@@ -14,39 +105,14 @@ class DifficultyOptimizer:
     """
     
     def __init__(self):
-        # Difficulty levels mapping for DP calculations
-        self.difficulty_map = {
-            DifficultyLevel.BEGINNER: 0,
-            DifficultyLevel.INTERMEDIATE: 1,
-            DifficultyLevel.ADVANCED: 2,
-            DifficultyLevel.EXPERT: 3
-        }
-        
-        self.reverse_difficulty_map = {v: k for k, v in self.difficulty_map.items()}
-        
-        # DP memoization table for optimal transitions
-        self.transition_cache = {}
-        
-        # Learning efficiency matrix (performance_rate, difficulty_level)
-        # Higher values indicate better learning outcomes
-        self.efficiency_matrix = np.array([
-            # Beginner, Intermediate, Advanced, Expert
-            [0.9, 0.7, 0.3, 0.1],  # High performance (>80% correct)
-            [0.8, 0.9, 0.6, 0.3],  # Good performance (60-80% correct)
-            [0.6, 0.8, 0.8, 0.5],  # Average performance (40-60% correct)
-            [0.4, 0.6, 0.7, 0.6],  # Poor performance (<40% correct)
-        ])
-        
-        # Transition costs for difficulty changes
-        self.transition_costs = {
-            0: 0,   # Stay same difficulty
-            1: 0.1, # Move up one level
-            -1: 0.05, # Move down one level
-            2: 0.3,   # Move up two levels
-            -2: 0.2,  # Move down two levels
-            3: 0.5,   # Move up three levels
-            -3: 0.4   # Move down three levels
-        }
+        # The tables are module-level constants shared by every optimizer (one per quiz queue)
+        self.difficulty_map = DIFFICULTY_MAP
+        self.reverse_difficulty_map = REVERSE_DIFFICULTY_MAP
+        self.efficiency_matrix = EFFICIENCY_MATRIX
+        self.transition_costs = TRANSITION_COSTS
+        self.transition_costs_arr = TRANSITION_COSTS_ARR
+        self.optimal_transitions = OPTIMAL_TRANSITIONS
+        self.optimal_next_difficulty = OPTIMAL_NEXT_DIFFICULTY
     
     def get_optimal_next_difficulty(self, 
                                   current_difficulty: DifficultyLevel,
@@ -63,89 +129,22 @@ class DifficultyOptimizer:
         Returns:
             Optimal next difficulty level
         """
+        # Every (performance category, level) answer is solved at import, so this is a table read
         current_level = self.difficulty_map[current_difficulty]
-        
-        # Create cache key for memoization
-        cache_key = (current_level, round(performance_score, 2))
-        
-        if cache_key in self.transition_cache:
-            return self.reverse_difficulty_map[self.transition_cache[cache_key]]
-        
-        # Calculate optimal transition using DP
-        optimal_level = self._calculate_optimal_transition(
-            current_level, performance_score, performance_history
-        )
-        
-        # Cache result for future use
-        self.transition_cache[cache_key] = optimal_level
-        
-        return self.reverse_difficulty_map[optimal_level]
-    
-    def _calculate_optimal_transition(self, 
-                                    current_level: int, 
-                                    performance_score: float,
-                                    performance_history: List[float] = None) -> int:
-        """
-        Calculate optimal difficulty transition using dynamic programming
-        """
-        # Determine performance category
-        perf_category = self._get_performance_category(performance_score)
-        
-        # Calculate value for each possible next difficulty level
-        max_value = -float('inf')
-        optimal_level = current_level
-        
-        for next_level in range(4):  # 0-3 for four difficulty levels
-            # Calculate transition cost
-            level_change = next_level - current_level
-            transition_cost = self.transition_costs.get(level_change, 0.5)
-            
-            # Get learning efficiency for this transition
-            efficiency = self.efficiency_matrix[perf_category][next_level]
-            
-            # Apply trend factor if performance history is available
-            trend_factor = self._calculate_trend_factor(performance_history) if performance_history else 1.0
-            
-            # Calculate total value: efficiency - transition_cost + trend_adjustment
-            total_value = efficiency - transition_cost + (trend_factor * 0.1)
-            
-            if total_value > max_value:
-                max_value = total_value
-                optimal_level = next_level
-        
-        return optimal_level
+        return self.optimal_next_difficulty[_performance_category(performance_score)][current_level]
     
     def _get_performance_category(self, performance_score: float) -> int:
         """
         Convert performance score to category index for efficiency matrix
         """
-        if performance_score >= 0.8:
-            return 0  # High performance
-        elif performance_score >= 0.6:
-            return 1  # Good performance
-        elif performance_score >= 0.4:
-            return 2  # Average performance
-        else:
-            return 3  # Poor performance
+        return _performance_category(performance_score)
     
     def _calculate_trend_factor(self, performance_history: List[float]) -> float:
         """
         Calculate performance trend factor for DP optimization
         Positive trend = improving, Negative trend = declining
         """
-        if len(performance_history) < 3:
-            return 1.0
-        
-        # Calculate simple linear trend
-        recent_scores = performance_history[-3:]
-        if len(recent_scores) < 2:
-            return 1.0
-        
-        # Simple trend calculation: (last - first) / length
-        trend = (recent_scores[-1] - recent_scores[0]) / (len(recent_scores) - 1)
-        
-        # Normalize trend factor between 0.5 and 1.5
-        return max(0.5, min(1.5, 1.0 + trend))
+        return _trend_factor(performance_history)
     
     def optimize_quiz_difficulty_sequence(self, 
                                         questions_count: int,
@@ -155,63 +154,65 @@ class DifficultyOptimizer:
         Generate optimal difficulty sequence for a complete quiz
         Uses DP to create a progression that maximizes learning
         """
-        sequence = [starting_difficulty]
-        current_difficulty = starting_difficulty
+        levels = self.optimize_quiz_difficulty_sequence_idx(
+            questions_count, starting_difficulty, target_performance
+        )
+        return [self.reverse_difficulty_map[level] for level in levels.tolist()]
+    
+    def optimize_quiz_difficulty_sequence_idx(self, 
+                                            questions_count: int,
+                                            starting_difficulty: DifficultyLevel,
+                                            target_performance: float = 0.7) -> np.ndarray:
+        """
+        Same progression as optimize_quiz_difficulty_sequence, as an int8 array of level
+        indices for numeric callers (e.g. analyze_difficulty_progression)
+        """
+        # Draw every performance variation in one call, then walk integer levels through
+        # the precomputed transition table
+        variations = np.random.normal(0, 0.1, max(questions_count - 1, 0)).tolist()
+        level = self.difficulty_map[starting_difficulty]
+        levels = [level]
         simulated_performance = target_performance
         
-        for i in range(1, questions_count):
-            # Simulate slight performance variation
-            performance_variation = np.random.normal(0, 0.1)
+        for performance_variation in variations:
+            # The clamp depends on the previous value, so the walk stays sequential
             simulated_performance = max(0.0, min(1.0, simulated_performance + performance_variation))
-            
-            # Get next optimal difficulty
-            next_difficulty = self.get_optimal_next_difficulty(
-                current_difficulty, simulated_performance
-            )
-            
-            sequence.append(next_difficulty)
-            current_difficulty = next_difficulty
+            level = self.optimal_transitions[_performance_category(simulated_performance)][level]
+            levels.append(level)
         
-        return sequence
+        return np.array(levels, dtype=np.int8)
     
     def analyze_difficulty_progression(self, 
-                                     actual_sequence: List[DifficultyLevel],
+                                     actual_sequence: Union[List[DifficultyLevel], np.ndarray],
                                      performance_scores: List[float]) -> Dict[str, any]:
         """
         Analyze the effectiveness of a difficulty progression
+        actual_sequence may be DifficultyLevels or an integer array of level indices
         """
         if len(actual_sequence) != len(performance_scores):
             return {"error": "Sequence and scores length mismatch"}
         
+        # Build the level and score arrays once; every statistic is a vectorized reduction
+        if isinstance(actual_sequence, np.ndarray):
+            levels = actual_sequence.astype(np.int64, copy=False)
+        else:
+            levels = np.fromiter((self.difficulty_map[d] for d in actual_sequence), dtype=np.int64,
+                                 count=len(actual_sequence))
+        scores = np.asarray(performance_scores, dtype=np.float64)
+        categories = _performance_categories(scores)
+        level_changes = np.abs(np.diff(levels))
+        
         analysis = {
-            'average_performance': np.mean(performance_scores),
-            'performance_variance': np.var(performance_scores),
-            'difficulty_changes': 0,
-            'optimal_efficiency': 0.0,
+            'average_performance': scores.mean(),
+            'performance_variance': scores.var(),
+            'difficulty_changes': int(np.count_nonzero(level_changes)),
+            'optimal_efficiency': self.efficiency_matrix[categories, levels].mean(),
             'progression_smoothness': 0.0
         }
         
-        # Count difficulty changes
-        for i in range(1, len(actual_sequence)):
-            if actual_sequence[i] != actual_sequence[i-1]:
-                analysis['difficulty_changes'] += 1
-        
-        # Calculate optimal efficiency score
-        total_efficiency = 0
-        for i, (difficulty, performance) in enumerate(zip(actual_sequence, performance_scores)):
-            perf_category = self._get_performance_category(performance)
-            difficulty_level = self.difficulty_map[difficulty]
-            efficiency = self.efficiency_matrix[perf_category][difficulty_level]
-            total_efficiency += efficiency
-        
-        analysis['optimal_efficiency'] = total_efficiency / len(actual_sequence)
-        
         # Calculate progression smoothness (fewer abrupt changes = smoother)
-        if len(actual_sequence) > 1:
-            difficulty_numbers = [self.difficulty_map[d] for d in actual_sequence]
-            changes = [abs(difficulty_numbers[i] - difficulty_numbers[i-1]) 
-                      for i in range(1, len(difficulty_numbers))]
-            analysis['progression_smoothness'] = 1.0 - (sum(changes) / (len(changes) * 3))
+        if len(level_changes):
+            analysis['progression_smoothness'] = 1.0 - (level_changes.sum() / (len(level_changes) * 3))
         
         return analysis
     
@@ -227,18 +228,26 @@ class DifficultyOptimizer:
                 'reasoning': 'No performance history available'
             }
         
-        # Analyze recent performance by difficulty
-        difficulty_performance = {}
+        # Analyze recent performance by difficulty: running [sum, count] per difficulty in
+        # one pass (first-seen order is kept, which decides ties below)
+        totals = {}
         for difficulty, score in user_performance_history[-10:]:  # Recent 10 questions
-            if difficulty not in difficulty_performance:
-                difficulty_performance[difficulty] = []
-            difficulty_performance[difficulty].append(score)
+            entry = totals.get(difficulty)
+            if entry is None:
+                totals[difficulty] = [score, 1]
+            else:
+                entry[0] += score
+                entry[1] += 1
         
         # Calculate average performance per difficulty
-        avg_performance = {}
-        for difficulty, scores in difficulty_performance.items():
-            avg_performance[difficulty] = np.mean(scores)
-        
+        avg_performance = {difficulty: total / count for difficulty, (total, count) in totals.items()}
+        return self.recommend_from_averages(avg_performance)
+    
+    def recommend_from_averages(self, avg_performance: Dict[DifficultyLevel, float]) -> Dict[str, any]:
+        """
+        Recommendation from recent average performance per difficulty, for callers that
+        keep running totals; ties go to the difficulty listed first
+        """
         # Find best performing difficulty and recommend next level
         if avg_performance:
             best_difficulty = max(avg_performance.keys(), key=lambda d: avg_performance[d])
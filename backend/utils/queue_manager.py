@@ -3,12 +3,15 @@ Queue Manager - Implements Deque-based question sequencing
 Manages question ordering, adaptive difficulty adjustment, and quiz flow.
 """
 
-from collections import deque
+from collections import Counter, deque
+from itertools import chain, islice
 from typing import List, Optional, Dict, Any
 from backend.models.question import QuestionResponse, DifficultyLevel
 from backend.utils.dynamic_programming import DifficultyOptimizer
 import random
 
+PERFORMANCE_WINDOW = 10
+
 class QuestionQueue:
     """
     Deque-based question queue for efficient question sequencing
@@ -20,7 +23,14 @@ class QuestionQueue:
         self.adaptive_mode = adaptive_mode
         self.difficulty_optimizer = DifficultyOptimizer()
         self.answered_questions = []
-        self.performance_history = []
+        # Recent performance for adaptive adjustments; the deque evicts the oldest score in O(1)
+        self.performance_history = deque(maxlen=PERFORMANCE_WINDOW)
+        # (difficulty, score) for the same window, with running [sum, count] per difficulty
+        self.difficulty_history = deque(maxlen=PERFORMANCE_WINDOW)
+        self._difficulty_totals: Dict[DifficultyLevel, List[float]] = {}
+        # Difficulty the queue is known to be partitioned for; popping keeps the partition,
+        # adding or moving questions resets it
+        self._ordered_for: Optional[DifficultyLevel] = None
         
         # Queue statistics
         self.stats = {
@@ -40,15 +50,17 @@ class QuestionQueue:
         Add multiple questions to the queue
         Optionally randomizes order for variety
         """
-        question_list = questions.copy()
-        
         if randomize:
-            random.shuffle(question_list)
+            questions = list(questions)
+            random.shuffle(questions)
         
-        for question in question_list:
-            self.queue.append(question)
-            self.stats['total_added'] += 1
-            self.stats['difficulty_distribution'][question.difficulty.value] += 1
+        # One C-level extend, then a single stats update per difficulty
+        self.queue.extend(questions)
+        self._ordered_for = None
+        self.stats['total_added'] += len(questions)
+        distribution = self.stats['difficulty_distribution']
+        for difficulty, count in Counter(question.difficulty for question in questions).items():
+            distribution[difficulty.value] += count
         
         self._update_stats()
     
@@ -61,6 +73,7 @@ class QuestionQueue:
             self.queue.appendleft(question)
         else:
             self.queue.append(question)
+        self._ordered_for = None
         
         self.stats['total_added'] += 1
         self.stats['difficulty_distribution'][question.difficulty.value] += 1
@@ -96,7 +109,7 @@ class QuestionQueue:
         """
         Preview multiple upcoming questions without removing them
         """
-        return list(self.queue)[:count]
+        return list(islice(self.queue, max(count, 0)))
     
     def record_answer(self, question: QuestionResponse, is_correct: bool, time_taken: float):
         """
@@ -109,12 +122,39 @@ class QuestionQueue:
             'difficulty': question.difficulty
         }
         
+        score = 1.0 if is_correct else 0.0
         self.answered_questions.append(answer_record)
-        self.performance_history.append(1.0 if is_correct else 0.0)
+        self.performance_history.append(score)
+        
+        # Evict the oldest answer from the running totals before the deque drops it
+        if len(self.difficulty_history) == PERFORMANCE_WINDOW:
+            old_difficulty, old_score = self.difficulty_history[0]
+            totals = self._difficulty_totals[old_difficulty]
+            totals[0] -= old_score
+            totals[1] -= 1
+            if not totals[1]:
+                del self._difficulty_totals[old_difficulty]
+        self.difficulty_history.append((question.difficulty, score))
+        totals = self._difficulty_totals.setdefault(question.difficulty, [0.0, 0])
+        totals[0] += score
+        totals[1] += 1
+    
+    def get_difficulty_recommendations(self) -> Dict[str, Any]:
+        """
+        Difficulty recommendation from the recent answers
+        Same result as DifficultyOptimizer.get_difficulty_recommendations on the answer history,
+        read from the running totals
+        """
+        if not self.difficulty_history:
+            return self.difficulty_optimizer.get_difficulty_recommendations([])
         
-        # Keep only recent performance for adaptive adjustments
-        if len(self.performance_history) > 10:
-            self.performance_history.pop(0)
+        # Ties go to the difficulty seen first in the window, as in the optimizer
+        first_seen = dict.fromkeys(difficulty for difficulty, _ in self.difficulty_history)
+        avg_performance = {
+            difficulty: self._difficulty_totals[difficulty][0] / self._difficulty_totals[difficulty][1]
+            for difficulty in first_seen
+        }
+        return self.difficulty_optimizer.recommend_from_averages(avg_performance)
     
     def _apply_adaptive_ordering(self):
         """
@@ -125,7 +165,8 @@ class QuestionQueue:
             return
         
         # Calculate current performance trend
-        recent_performance = sum(self.performance_history[-3:]) / 3
+        history = self.performance_history
+        recent_performance = (history[-1] + history[-2] + history[-3]) / 3
         
         # Get optimal next difficulty from DP algorithm
         current_difficulty = self._get_current_difficulty_level()
@@ -133,33 +174,36 @@ class QuestionQueue:
             current_difficulty, recent_performance
         )
         
-        # Reorder queue to prioritize optimal difficulty questions
-        self._reorder_by_difficulty(optimal_difficulty)
+        # Reorder queue to prioritize optimal difficulty questions, unless it already is
+        if optimal_difficulty != self._ordered_for:
+            self._reorder_by_difficulty(optimal_difficulty)
     
     def _reorder_by_difficulty(self, target_difficulty: DifficultyLevel):
         """
         Reorder queue to prioritize questions of target difficulty
+        Stable partition in a single pass; the deque is left untouched when it is
+        already partitioned (no target question behind a non-target one)
         """
-        queue_list = list(self.queue)
-        self.queue.clear()
-        
-        # Separate questions by difficulty match
         target_questions = []
         other_questions = []
+        needs_reorder = False
         
-        for question in queue_list:
+        for question in self.queue:
             if question.difficulty == target_difficulty:
                 target_questions.append(question)
+                if other_questions:
+                    needs_reorder = True
             else:
                 other_questions.append(question)
         
-        # Add target difficulty questions first
-        for question in target_questions:
-            self.queue.append(question)
+        self._ordered_for = target_difficulty
+        if not needs_reorder:
+            return
         
-        # Add remaining questions
-        for question in other_questions:
-            self.queue.append(question)
+        # Add target difficulty questions first, then the remaining questions
+        self.queue.clear()
+        self.queue.extend(target_questions)
+        self.queue.extend(other_questions)
     
     def _get_current_difficulty_level(self) -> DifficultyLevel:
         """
@@ -175,16 +219,66 @@ class QuestionQueue:
         """Update queue statistics"""
         self.stats['current_size'] = len(self.queue)
     
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSON-ready snapshot of the queue for shared session storage
+        Each question is stored once and referenced by id from the queue and answer history.
+        """
+        questions = {}
+        for question in chain(self.queue, (record['question'] for record in self.answered_questions)):
+            questions.setdefault(str(question.id), question)
+        
+        return {
+            'adaptive_mode': self.adaptive_mode,
+            'questions': {qid: question.model_dump(mode='json', by_alias=True) for qid, question in questions.items()},
+            'queue': [str(question.id) for question in self.queue],
+            'answered': [
+                [str(record['question'].id), record['is_correct'], record['time_taken']]
+                for record in self.answered_questions
+            ],
+            'performance_history': list(self.performance_history),
+            'difficulty_history': [[difficulty.value, score] for difficulty, score in self.difficulty_history],
+            'ordered_for': self._ordered_for.value if self._ordered_for else None,
+            'stats': self.stats
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuestionQueue':
+        """Rebuild a queue from to_dict() output"""
+        question_queue = cls(adaptive_mode=data['adaptive_mode'])
+        questions = {qid: QuestionResponse.model_validate(question) for qid, question in data['questions'].items()}
+        
+        question_queue.queue.extend(questions[qid] for qid in data['queue'])
+        question_queue.answered_questions = [
+            {
+                'question': questions[qid],
+                'is_correct': is_correct,
+                'time_taken': time_taken,
+                'difficulty': questions[qid].difficulty
+            }
+            for qid, is_correct, time_taken in data['answered']
+        ]
+        question_queue.performance_history.extend(data['performance_history'])
+        for difficulty, score in data['difficulty_history']:
+            difficulty = DifficultyLevel(difficulty)
+            question_queue.difficulty_history.append((difficulty, score))
+            totals = question_queue._difficulty_totals.setdefault(difficulty, [0.0, 0])
+            totals[0] += score
+            totals[1] += 1
+        question_queue._ordered_for = DifficultyLevel(data['ordered_for']) if data['ordered_for'] else None
+        question_queue.stats = data['stats']
+        return question_queue
+    
     def get_queue_status(self) -> Dict[str, Any]:
         """
         Get comprehensive queue status and statistics
         """
         return {
             'queue_size': len(self.queue),
-            'performance_trend': self.performance_history[-5:] if self.performance_history else [],
+            'performance_trend': list(self.performance_history)[-5:],
             'adaptive_mode': self.adaptive_mode,
             'stats': self.stats,
-            'next_difficulties': [q.difficulty.value for q in list(self.queue)[:5]]
+            'next_difficulties': [q.difficulty.value for q in islice(self.queue, 5)]
         }
     
     def clear_queue(self):
@@ -192,6 +286,9 @@ class QuestionQueue:
         self.queue.clear()
         self.answered_questions.clear()
         self.performance_history.clear()
+        self.difficulty_history.clear()
+        self._difficulty_totals.clear()
+        self._ordered_for = None
         self._reset_stats()
     
     def _reset_stats(self):
@@ -213,15 +310,16 @@ class QuestionQueue:
         queue_list = list(self.queue)
         random.shuffle(queue_list)
         self.queue = deque(queue_list)
+        self._ordered_for = None
     
     def insert_at_position(self, question: QuestionResponse, position: int):
         """Insert a question at a specific position in the queue"""
         if position < 0 or position > len(self.queue):
             position = len(self.queue)
         
-        queue_list = list(self.queue)
-        queue_list.insert(position, question)
-        self.queue = deque(queue_list)
+        # deque.insert rotates in place, moving min(position, n - position) items
+        self.queue.insert(position, question)
+        self._ordered_for = None
         
         self.stats['total_added'] += 1
         self.stats['difficulty_distribution'][question.difficulty.value] += 1
@@ -0,0 +1,150 @@
+"""
+Session Store - Shared storage for active quiz sessions and generated questions
+Uses Redis when REDIS_URL is configured so multiple workers share state,
+falling back to in-process dictionaries otherwise.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+import orjson
+from backend.models.question import QuestionResponse
+from backend.utils.queue_manager import QuestionQueue
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import WatchError
+except ImportError:  # Redis is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SECONDS = 3600
+QUESTIONS_KEY = "quiz:questions"
+
+T = TypeVar("T")
+
+
+class SessionStore:
+    """
+    Stores QuestionQueue sessions (JSON via QuestionQueue.to_dict, with a TTL) and
+    questions (JSON in a Redis hash keyed by question id). Questions are also indexed locally so
+    repeat lookups on the same worker skip the Redis round-trip.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis = None
+        if redis_url:
+            if aioredis is None:
+                logger.warning("REDIS_URL is set but the redis package is not installed; using in-memory sessions")
+            else:
+                self.redis = aioredis.from_url(redis_url)
+
+        self.sessions: Dict[str, QuestionQueue] = {}
+        self.question_index: Dict[str, QuestionResponse] = {}
+        self.correct_option_text: Dict[str, Optional[str]] = {}  # question id -> correct option text
+
+    @staticmethod
+    def _session_key(quiz_id: str) -> str:
+        return f"session:{quiz_id}"
+
+    # Plain JSON rather than pickle, so data read back from Redis can never execute code
+    @staticmethod
+    def _dump_session(question_queue: QuestionQueue) -> bytes:
+        return orjson.dumps(question_queue.to_dict())
+
+    @staticmethod
+    def _load_session(data: bytes) -> QuestionQueue:
+        return QuestionQueue.from_dict(orjson.loads(data))
+
+    async def get_session(self, quiz_id: str) -> Optional[QuestionQueue]:
+        """Get the question queue for a quiz session (read-only; use update_session to change it)"""
+        if self.redis is None:
+            return self.sessions.get(quiz_id)
+
+        data = await self.redis.get(self._session_key(quiz_id))
+        return self._load_session(data) if data else None
+
+    async def save_session(self, quiz_id: str, question_queue: QuestionQueue):
+        """Store a new session, replacing any existing one"""
+        if self.redis is None:
+            self.sessions[quiz_id] = question_queue
+            return
+
+        await self.redis.set(self._session_key(quiz_id), self._dump_session(question_queue), ex=SESSION_TTL_SECONDS)
+
+    async def update_session(
+        self, quiz_id: str, update: Callable[[QuestionQueue], T]
+    ) -> Tuple[Optional[QuestionQueue], Optional[T]]:
+        """
+        Apply `update` to a session and persist it atomically, returning (queue, update result)
+        With Redis this is an optimistic WATCH/MULTI transaction retried when another worker
+        changes the session in between, so concurrent updates are never lost. Returns
+        (None, None) if the session doesn't exist.
+        """
+        if self.redis is None:
+            # update is synchronous, so nothing else can run between the read and the write
+            question_queue = self.sessions.get(quiz_id)
+            if question_queue is None:
+                return None, None
+            return question_queue, update(question_queue)
+
+        key = self._session_key(quiz_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    data = await pipe.get(key)
+                    if not data:
+                        return None, None
+                    question_queue = self._load_session(data)
+                    result = update(question_queue)
+                    pipe.multi()
+                    pipe.set(key, self._dump_session(question_queue), ex=SESSION_TTL_SECONDS)
+                    await pipe.execute()
+                    return question_queue, result
+                except WatchError:
+                    logger.debug("Session %s changed during update, retrying", quiz_id)
+
+    async def delete_session(self, quiz_id: str) -> bool:
+        """Remove a quiz session, returning whether it existed"""
+        if self.redis is None:
+            return self.sessions.pop(quiz_id, None) is not None
+
+        return await self.redis.delete(self._session_key(quiz_id)) > 0
+
+    async def add_questions(self, questions: List[QuestionResponse]):
+        """Index questions locally and share them with other workers"""
+        if not questions:
+            return
+
+        mapping = {str(question.id): question for question in questions}
+        self.question_index.update(mapping)
+        for qid, question in mapping.items():
+            self.correct_option_text[qid] = self._find_correct_option_text(question)
+
+        if self.redis is not None:
+            await self.redis.hset(
+                QUESTIONS_KEY,
+                mapping={qid: question.model_dump_json(by_alias=True) for qid, question in mapping.items()}
+            )
+
+    async def get_question(self, question_id: str) -> Optional[QuestionResponse]:
+        """Look up a question by id, falling back to Redis on a local miss"""
+        question = self.question_index.get(question_id)
+        if question is None and self.redis is not None:
+            data = await self.redis.hget(QUESTIONS_KEY, question_id)
+            if data:
+                question = QuestionResponse.model_validate_json(data)
+                self.question_index[question_id] = question
+        return question
+
+    def get_correct_option_text(self, question: QuestionResponse) -> Optional[str]:
+        """Text of the correct option, computed once per question"""
+        question_id = str(question.id)
+        if question_id not in self.correct_option_text:
+            self.correct_option_text[question_id] = self._find_correct_option_text(question)
+        return self.correct_option_text[question_id]
+
+    @staticmethod
+    def _find_correct_option_text(question: QuestionResponse) -> Optional[str]:
+        return next((opt.text for opt in question.options if opt.is_correct), None)
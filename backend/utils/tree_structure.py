@@ -3,8 +3,11 @@ Tree Structure Implementation - Hierarchical Question Organization
 Organizes questions in a tree structure: Subject → Topic → Difficulty → Questions
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Sequence, Tuple
+from bisect import insort
 from collections import defaultdict
+from operator import itemgetter
+from bson import ObjectId
 from backend.models.question import QuestionResponse, DifficultyLevel
 
 class QuestionNode:
@@ -17,6 +20,7 @@ class QuestionNode:
         self.questions: List[QuestionResponse] = []
         self.metadata = {
             'count': 0,
+            'total_questions': 0,  # Questions in this subtree, kept current by QuestionTree
             'difficulty_distribution': defaultdict(int),
             'success_rate': 0.0
         }
@@ -30,14 +34,17 @@ class QuestionNode:
         """Get a child node by key"""
         return self.children.get(key)
     
+    def iter_all_questions(self) -> Iterator[QuestionResponse]:
+        """Yield all questions from this node and its children, depth-first in insertion order"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield from node.questions
+            stack.extend(reversed(node.children.values()))
+    
     def get_all_questions(self) -> List[QuestionResponse]:
-        """Recursively get all questions from this node and its children"""
-        all_questions = self.questions.copy()
-        
-        for child in self.children.values():
-            all_questions.extend(child.get_all_questions())
-        
-        return all_questions
+        """Get all questions from this node and its children as a list"""
+        return list(self.iter_all_questions())
 
 class QuestionTree:
     """
@@ -49,36 +56,78 @@ class QuestionTree:
         self.root = QuestionNode("root", "root")
         self.total_questions = 0
         
+        # Bumped on every mutation; used to invalidate cached views of the tree
+        self.version = 0
+        self._structure_cache: Optional[tuple] = None  # (version, structure)
+        
+        # Difficulty nodes indexed by difficulty and by (subject, difficulty), each list kept
+        # in tree order via the (subject rank, topic rank) of the node's path
+        self._subject_rank: Dict[str, int] = {}
+        self._topic_rank: Dict[tuple, int] = {}
+        self._by_difficulty: Dict[str, List[tuple]] = defaultdict(list)
+        self._by_subject_difficulty: Dict[tuple, List[tuple]] = defaultdict(list)
+        
     def add_question(self, question: QuestionResponse):
         """
         Add a question to the tree structure
         Automatically creates intermediate nodes if they don't exist
         """
+        path = self._get_or_create_path(question.subject, question.topic, question.difficulty)
+        
+        # Add question to the difficulty node
+        path[-1].questions.append(question)
+        
+        # Update metadata
+        self._update_metadata(path, question.difficulty.value, 1)
+        self.total_questions += 1
+        self.version += 1
+    
+    def add_questions_bulk(self, questions: List[QuestionResponse]):
+        """
+        Add many questions at once
+        Groups questions by path so each subject/topic/difficulty node is resolved once
+        """
+        grouped: Dict[tuple, List[QuestionResponse]] = defaultdict(list)
+        for question in questions:
+            grouped[(question.subject, question.topic, question.difficulty)].append(question)
+        
+        for (subject, topic, difficulty), group in grouped.items():
+            path = self._get_or_create_path(subject, topic, difficulty)
+            path[-1].questions.extend(group)
+            self._update_metadata(path, difficulty.value, len(group))
+        
+        self.total_questions += len(questions)
+        self.version += 1
+    
+    def _get_or_create_path(self, subject: str, topic: str,
+                            difficulty: DifficultyLevel) -> Tuple[QuestionNode, QuestionNode, QuestionNode]:
+        """Navigate to the subject, topic and difficulty nodes for a path, creating missing nodes"""
         # Navigate/create subject node
-        subject_node = self.root.get_child(question.subject)
+        subject_node = self.root.get_child(subject)
         if not subject_node:
-            subject_node = QuestionNode(question.subject, "subject")
-            self.root.add_child(question.subject, subject_node)
+            subject_node = QuestionNode(subject, "subject")
+            self._subject_rank[subject] = len(self.root.children)
+            self.root.add_child(subject, subject_node)
         
         # Navigate/create topic node
-        topic_node = subject_node.get_child(question.topic)
+        topic_node = subject_node.get_child(topic)
         if not topic_node:
-            topic_node = QuestionNode(question.topic, "topic")
-            subject_node.add_child(question.topic, topic_node)
+            topic_node = QuestionNode(topic, "topic")
+            self._topic_rank[(subject, topic)] = len(subject_node.children)
+            subject_node.add_child(topic, topic_node)
         
         # Navigate/create difficulty node
-        difficulty_key = question.difficulty.value
+        difficulty_key = difficulty.value
         difficulty_node = topic_node.get_child(difficulty_key)
         if not difficulty_node:
-            difficulty_node = QuestionNode(question.difficulty, "difficulty")
+            difficulty_node = QuestionNode(difficulty, "difficulty")
             topic_node.add_child(difficulty_key, difficulty_node)
+            
+            entry = ((self._subject_rank[subject], self._topic_rank[(subject, topic)]), difficulty_node)
+            insort(self._by_difficulty[difficulty_key], entry, key=itemgetter(0))
+            insort(self._by_subject_difficulty[(subject, difficulty_key)], entry, key=itemgetter(0))
         
-        # Add question to the difficulty node
-        difficulty_node.questions.append(question)
-        
-        # Update metadata
-        self._update_metadata(question)
-        self.total_questions += 1
+        return subject_node, topic_node, difficulty_node
     
     def get_questions_by_criteria(self, 
                                  subject: Optional[str] = None,
@@ -91,8 +140,15 @@ class QuestionTree:
         """
         questions = []
         
+        # Difficulty without topic: read the matching difficulty nodes from the index instead
+        # of probing every subject/topic
+        if difficulty and not topic:
+            index_key = (subject, difficulty.value) if subject else difficulty.value
+            index = self._by_subject_difficulty if subject else self._by_difficulty
+            search_nodes = [node for _, node in index.get(index_key, ())]
+        
         # Start from root or specific subject
-        if subject:
+        elif subject:
             subject_node = self.root.get_child(subject)
             if not subject_node:
                 return questions
@@ -109,29 +165,21 @@ class QuestionTree:
                     filtered_nodes.append(topic_node)
             search_nodes = filtered_nodes
         
-        # Filter by difficulty if specified
-        if difficulty:
+        # Filter topic nodes by difficulty (difficulty without a topic was resolved above)
+        if difficulty and topic:
             filtered_nodes = []
             for node in search_nodes:
-                if node.node_type == "topic":
-                    difficulty_node = node.get_child(difficulty.value)
-                    if difficulty_node:
-                        filtered_nodes.append(difficulty_node)
-                elif node.node_type == "subject":
-                    # Search all topics in the subject
-                    for topic_node in node.children.values():
-                        difficulty_node = topic_node.get_child(difficulty.value)
-                        if difficulty_node:
-                            filtered_nodes.append(difficulty_node)
+                difficulty_node = node.get_child(difficulty.value)
+                if difficulty_node:
+                    filtered_nodes.append(difficulty_node)
             search_nodes = filtered_nodes
         
-        # Collect questions from filtered nodes
+        # Collect questions from filtered nodes, stopping as soon as the limit is reached
         for node in search_nodes:
-            questions.extend(node.get_all_questions())
-        
-        # Apply limit if specified
-        if limit and len(questions) > limit:
-            questions = questions[:limit]
+            for question in node.iter_all_questions():
+                questions.append(question)
+                if limit and len(questions) >= limit:
+                    return questions
         
         return questions
     
@@ -139,7 +187,11 @@ class QuestionTree:
         """
         Get a dictionary representation of the tree structure
         Useful for frontend navigation and analytics
+        Cached until the tree next changes
         """
+        if self._structure_cache is not None and self._structure_cache[0] == self.version:
+            return self._structure_cache[1]
+        
         def build_structure(node: QuestionNode) -> Dict[str, Any]:
             structure = {
                 'type': node.node_type,
@@ -154,7 +206,9 @@ class QuestionTree:
             
             return structure
         
-        return build_structure(self.root)
+        structure = build_structure(self.root)
+        self._structure_cache = (self.version, structure)
+        return structure
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get comprehensive statistics about the question tree"""
@@ -164,50 +218,64 @@ class QuestionTree:
             'subjects_detail': {}
         }
         
+        # Counts come from node metadata maintained on add/remove, so no questions are walked
         for subject_key, subject_node in self.root.children.items():
             subject_stats = {
                 'topics': len(subject_node.children),
-                'total_questions': len(subject_node.get_all_questions()),
-                'difficulty_distribution': defaultdict(int),
+                'total_questions': subject_node.metadata['total_questions'],
+                'difficulty_distribution': defaultdict(int, subject_node.metadata['difficulty_distribution']),
                 'topics_detail': {}
             }
             
             for topic_key, topic_node in subject_node.children.items():
-                topic_questions = topic_node.get_all_questions()
                 subject_stats['topics_detail'][topic_key] = {
-                    'question_count': len(topic_questions),
+                    'question_count': topic_node.metadata['total_questions'],
                     'difficulties': list(topic_node.children.keys())
                 }
-                
-                # Count difficulty distribution
-                for question in topic_questions:
-                    subject_stats['difficulty_distribution'][question.difficulty.value] += 1
             
             stats['subjects_detail'][subject_key] = subject_stats
         
         return stats
     
-    def _update_metadata(self, question: QuestionResponse):
-        """Update tree metadata when a question is added"""
-        # This method can be expanded to maintain various statistics
-        # like success rates, difficulty distributions, etc.
-        pass
+    def _update_metadata(self, path: Sequence[QuestionNode], difficulty_key: str, delta: int):
+        """Apply a change of `delta` questions at `difficulty_key` to the counters along a path"""
+        for node in path:
+            node.metadata['total_questions'] += delta
+            distribution = node.metadata['difficulty_distribution']
+            distribution[difficulty_key] += delta
+            if distribution[difficulty_key] <= 0:
+                del distribution[difficulty_key]
     
     def remove_question(self, question_id: str) -> bool:
         """Remove a question from the tree by ID"""
-        def search_and_remove(node: QuestionNode) -> bool:
+        # Parse the id once and compare ObjectIds, instead of stringifying every question scanned
+        if not ObjectId.is_valid(question_id):
+            return False
+        target_id = ObjectId(question_id)
+        
+        def search_and_remove(node: QuestionNode) -> Optional[List[QuestionNode]]:
+            """Remove the question below `node`, returning the path to its node (or None)"""
             # Check questions in current node
             for i, question in enumerate(node.questions):
-                if str(question.id) == question_id:
+                if question.id == target_id:
                     node.questions.pop(i)
-                    self.total_questions -= 1
-                    return True
+                    return [node]
             
             # Search in children
             for child in node.children.values():
-                if search_and_remove(child):
-                    return True
+                path = search_and_remove(child)
+                if path is not None:
+                    path.append(node)
+                    return path
             
+            return None
+        
+        path = search_and_remove(self.root)
+        if path is None:
             return False
         
-        return search_and_remove(self.root)
\ No newline at end of file
+        # path runs difficulty node → root; the root's count is total_questions
+        self._update_metadata(path[:-1], path[0].value.value, -1)
+        self.total_questions -= 1
+        self.version += 1
+        return True
\ No newline at end of file